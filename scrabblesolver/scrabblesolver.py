@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 import curses
+import multiprocessing
 import re
-from os import listdir
+from os import cpu_count, listdir
 from importlib import import_module
 from scrabblesolver_common import Cell, CELL_CH
+from scrabblesolver_engine import Board, MoveSearch
 
 # # For debug only
 # import logging
@@ -38,101 +40,10 @@ def main(stdscr):
         except Exception:
             pass
     lang = import_module("scrabblesolver_{}".format(langs[ch]))
-    # TODO incroci con altre parole? Li gestisce l'utente!
-    def get_points(word, starty, startx, vert, table, tabj, cards):
-        """
-        Get value (points) of a word `w` starting at the given position
-        `start*`, going vertical if `vert` is True, on a table already populated
-        as in `table` with jollys on `tabj`, given that you have `cards` on the
-        ledger. Return 0 if you can't put that word in that position.
-        The word must fit within the table.
-        """
-        points = 0
-        wmul = 1
-        cards = list(cards)
-        icards = len(cards)
-        jollys = []
-        for k in range(len(word)):
-            jolly = False
-            i = starty + (k if vert else 0)
-            j = startx + (0 if vert else k)
-            if table[i][j] == " ":
-                if word[k] in cards:
-                    cards.remove(word[k])
-                    lmul = 2 if lang.TABLE[i][j] == Cell.L2 else (
-                        3 if lang.TABLE[i][j] == Cell.L3 else 1
-                    )
-                    points += lang.POINTS[word[k]] * lmul
-                elif "*" in cards:
-                    cards.remove("*")
-                    jolly = True
-                else:
-                    return 0, None
-                # Check if a word is formed perpendicularly at this location
-                if vert:
-                    if (j > 0 and table[i][j - 1] != " ") or (j < W - 1 and table[i][j + 1] != " "):
-                        si = j
-                        for l in range(j, -1, -1):
-                            if table[i][l] != " ":
-                                si = l
-                            else:
-                                break
-                        pw = ""
-                        for l in range(si, W):
-                            if table[i][l] != " ":
-                                pw += table[i][l]
-                            else:
-                                break
-                        if pw not in lang.DICT:
-                            return 0, None
-                else:
-                    if (i > 0 and table[i - 1][j] != " ") or (i < H - 1 and table[i + 1][j] != " "):
-                        si = i
-                        for l in range(i, -1, -1):
-                            if table[l][j] != " ":
-                                si = l
-                            else:
-                                break
-                        pw = ""
-                        for l in range(si, H):
-                            if table[l][j] != " ":
-                                pw += table[l][j]
-                            else:
-                                break
-                        if pw not in lang.DICT:
-                            return 0, None
-                # TODO check if we have formed new words perpindicularly
-                # TODO if we have, check that they are in lang.DICT
-                wmul *= 2 if lang.TABLE[i][j] == Cell.W2 else (
-                    3 if lang.TABLE[i][j] == Cell.W3 else 1
-                )
-            else:
-                if word[k] != table[i][j]:
-                    return 0, None
-                if not tabj[i][j]:
-                    lmul = 2 if lang.TABLE[i][j] == Cell.L2 else (
-                        3 if lang.TABLE[i][j] == Cell.L3 else 1
-                    )
-                    points += lang.POINTS[word[k]] * lmul
-                else:
-                    jolly = True
-                wmul *= 2 if lang.TABLE[i][j] == Cell.W2 else (
-                    3 if lang.TABLE[i][j] == Cell.W3 else 1
-                )
-            jollys.append(jolly)
-        extra = 0
-        dcards = icards - len(cards)
-        if dcards == 0:
-            return 0, None  # We have found a word that is already on the board
-        if any(jollys):
-            if dcards in lang.EXTRA_NJ:
-                extra += lang.EXTRA_NJ[dcards]
-        else:
-            if dcards in lang.EXTRA_N:
-                extra += lang.EXTRA_N[dcards]
-        if word in lang.EXTRA_W:
-            extra += lang.EXTRA_W[word]
-        return wmul * points + extra, jollys
+    # Worker processes for the word search, one per CPU (forked after loading
+    # the language, they share its dictionary)
+    JOBS = cpu_count() or 1
+    POOL = multiprocessing.Pool(JOBS) if JOBS > 1 else None
     stdscr.clear()
     stdscr.refresh()
 
@@ -216,8 +127,12 @@ def main(stdscr):
 
     # Current position, letters on table, letters on ledger, direction
     X, Y = 0, 0
-    TABLE = [[" "] * W for _ in range(H)]  # TABLE stores letters only
-    TABJ = [[False] * W for _ in range(H)]  # TABJ stores which letters are placed as a jolly
+    BOARD = Board(lang, [[" "] * W for _ in range(H)],
+                  [[False] * W for _ in range(H)])
+    TABLE = BOARD.letters[False]  # TABLE stores letters only
+    TABJ = BOARD.jollys[False]  # TABJ stores which letters are placed as a jolly
+    # TABLE and TABJ are changed only through BOARD.set, which keeps the
+    # cross-checks of the move generator up to date
     CARDS = ""
     VERT, J = False, True  # Vertical input, show jollys (vs show their letter)
     # TODO variable for solution currently being shown
@@ -257,46 +172,27 @@ def main(stdscr):
                 status("No letters!")
                 wtable.getkey(Y + 1, X + 1)
             else:
-                fWORDS = {}  # Dict of tuples word: (jollys, starty, startx, vert, points)
-                wtable.nodelay(True)  # Non-blocking getch for interruption
-                for i in range(H):
-                    for j in range(W):
-                        status("Looking for words {:.0%}".format((i * W + j) / W / H))
-                        if wtable.getch(Y + 1, X + 1) == ord('0'):
+                # Words are searched in background while the best ones found
+                # so far can be browsed
+                search = MoveSearch(BOARD, CARDS, pool=POOL, chunks=2 * JOBS)
+                search.start()
+                wtable.timeout(100)  # Refresh the words found every 100 ms
+                fI, fW = 0, None
+                color = curses.color_pair(Cell.W3)  # Red
+                while True:
+                    searching = search.is_alive()
+                    if not searching:
+                        wtable.timeout(-1)  # Restore blocking getkey
+                    fWORDS = search.top.sorted()  # Tuples (word, jollys, starty, startx, vert, points)
+                    if len(fWORDS) == 0:
+                        if not searching:
+                            status("No word found.")
+                            wtable.getkey(Y + 1, X + 1)
                             break
-                        # Look for horizontal words matching the letters
-                        # already on the board/table
-                        lmin = [k for k in range(j, W) if TABLE[i][k] != " " or lang.TABLE[i][k] == Cell.BEGIN]
-                        if j < W - 1 and len(lmin) != 0 and (j == 0 or TABLE[i][j - 1] == " "):
-                            lmin = max(2, lmin[0] - j + 1)
-                            for w in lang.DICT:
-                                if lmin <= len(w) <= W - j and (j + len(w) == W or TABLE[i][j + len(w)] == " "):
-                                    pts, js = get_points(w, i, j, False, TABLE, TABJ, CARDS)
-                                    if pts != 0:
-                                        if w not in fWORDS or fWORDS[w][-1] < pts:
-                                            fWORDS[w] = (js, i, j, False, pts)
-                        # Look for vertical words matching the letters
-                        # already on the board/table
-                        lmin = [k for k in range(i, H) if TABLE[k][j] != " " or lang.TABLE[k][j] == Cell.BEGIN]
-                        if i < H - 1 and len(lmin) != 0 and (i == 0 or TABLE[i - 1][j] == " "):
-                            lmin = max(2, lmin[0] - i + 1)
-                            for w in lang.DICT:
-                                if lmin <= len(w) <= H - i and (i + len(w) == H or TABLE[i + len(w)][j] == " "):
-                                    pts, js = get_points(w, i, j, True, TABLE, TABJ, CARDS)
-                                    if pts != 0:
-                                        if w not in fWORDS or fWORDS[w][-1] < pts:
-                                            fWORDS[w] = (js, i, j, True, pts)
-                wtable.nodelay(False)  # Restore blocking getch
-                if len(fWORDS) == 0:
-                    status("No word found.")
-                    wtable.getkey(Y + 1, X + 1)
-                else:
-                    # Word selection loop
-                    fI = 0
-                    color = curses.color_pair(Cell.W3)  # Red
-                    fWORDS = [(k, *fWORDS[k]) for k in fWORDS]
-                    fWORDS.sort(key=lambda x: -x[-1])
-                    while True:
+                        status("Looking for words {:.0%}".format(search.progress()))
+                    else:
+                        # Keep showing the same word while better ones come
+                        fI = next((n for n, x in enumerate(fWORDS) if x[0] == fW), min(fI, len(fWORDS) - 1))
                         fW, fJ, fY, fX, fV, fP = fWORDS[fI]
                         for i in range(H):
                             for j in range(W):
@@ -309,30 +205,44 @@ def main(stdscr):
                                 ch = "*" if fJ[k] else fW[k]
                                 wtable.addstr(i + 1, j + 1, ch, color)
                         wtable.refresh()
-                        status("{} ({})".format(fW, fP))
+                        if searching:
+                            status("{} ({}) {:.0%}".format(fW, fP, search.progress()))
+                        else:
+                            status("{} ({})".format(fW, fP))
 
+                    try:
                         k = wtable.getkey(Y + 1, X + 1).upper()
-                        if k == "KEY_PPAGE" or k == "KEY_UP" or k == "KEY_LEFT":
+                    except curses.error:
+                        continue  # No key within the timeout
+                    if k == "KEY_PPAGE" or k == "KEY_UP" or k == "KEY_LEFT":
+                        if len(fWORDS) != 0:
                             fI = max(fI - 1, 0)
-                        elif k == "KEY_NPAGE" or k == "KEY_DOWN" or k == "KEY_RIGHT":
+                            fW = fWORDS[fI][0]
+                    elif k == "KEY_NPAGE" or k == "KEY_DOWN" or k == "KEY_RIGHT":
+                        if len(fWORDS) != 0:
                             fI = min(fI + 1, len(fWORDS) - 1)
-                        elif k == "\n":  # Enter
-                            for k in range(len(fW)):
-                                i = fY + (k if fV else 0)
-                                j = fX + (0 if fV else k)
-                                TABLE[i][j] = fW[k]
-                                TABJ[i][j] = fJ[k]
-                                CARDS = ""
-                                wcards.addstr(1, 1 + (WC - lang.NCARDS) // 2, " " * lang.NCARDS)
-                                wcards.addstr(1, 1 + (WC - lang.NCARDS) // 2, CARDS)
-                                wcards.refresh()
-                            break
-                        elif k == "0":  # ESC is '\0x1b'
-                            break
+                            fW = fWORDS[fI][0]
+                    elif k == "\n" and len(fWORDS) != 0:  # Enter
+                        search.stop()  # The table is about to change
+                        for k in range(len(fW)):
+                            i = fY + (k if fV else 0)
+                            j = fX + (0 if fV else k)
+                            BOARD.set(i, j, fW[k], fJ[k])
+                            CARDS = ""
+                            wcards.addstr(1, 1 + (WC - lang.NCARDS) // 2, " " * lang.NCARDS)
+                            wcards.addstr(1, 1 + (WC - lang.NCARDS) // 2, CARDS)
+                            wcards.refresh()
+                        break
+                    elif k == "0":  # ESC is '\0x1b'
+                        break
+                search.stop()
+                wtable.timeout(-1)
             # Out of the loop, the table will be updated at the end of the if
             finderkeys(False)
             status("Table input, " + ("vertical" if VERT else "horizontal"))
         elif k == "0":
+            if POOL is not None:
+                POOL.terminate()
             break  # Exit
         elif k == " ":
             VERT = not VERT
@@ -346,35 +256,32 @@ def main(stdscr):
         elif k == "KEY_RIGHT":
             X = min(W - 1, X + 1)
         elif k == "KEY_DC":
-            TABLE[Y][X] = " " # DEL
-            TABJ[Y][X] = False
+            BOARD.set(Y, X, " ")  # DEL
         elif k == "KEY_BACKSPACE":
             if VERT:
                 Y = max(0, Y - 1)
             else:
                 X = max(0, X - 1)
-            TABLE[Y][X] = " "
-            TABJ[Y][X] = False
+            BOARD.set(Y, X, " ")
         elif k == "\t":
             J = not J
         elif k == "*":
             status("Type the letter the jolly means")
             k = wtable.getkey(Y + 1, X + 1).upper()
             if k in lang.LETTERS and k != "*":
-                TABLE[Y][X] = k
-                TABJ[Y][X] = True
+                BOARD.set(Y, X, k, True)
             status("Table input, " + ("vertical" if VERT else "horizontal"))
             if VERT:
                 Y = min(H - 1, Y + 1)
             else:
                 X = min(W - 1, X + 1)
         elif k in lang.LETTERS:  # and k != "*"
-            TABLE[Y][X] = k
-            TABJ[Y][X] = False
+            BOARD.set(Y, X, k)
             if VERT:
                 Y = min(H - 1, Y + 1)
             else:
                 X = min(W - 1, X + 1)
 
 
-curses.wrapper(main)
+if __name__ == "__main__":
+    curses.wrapper(main)
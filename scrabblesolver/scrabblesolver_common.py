@@ -1,7 +1,11 @@
 # Common parts of different Scrabble solver languages
+import marshal
+import os
+from array import array
 from enum import IntEnum
+from os.path import abspath, dirname, expanduser, isfile, join
 
-__ALL__ = ['Cell', 'CELL_CH']
+__ALL__ = ['Cell', 'CELL_CH', 'Lexicon', 'load_dict']
 
 
 class Cell(IntEnum):
@@ -16,3 +20,291 @@ class Cell(IntEnum):
 
 CELL_CH = {Cell.SIMPLE: ' ', Cell.BEGIN: '2', Cell.L2: '2', Cell.L3: '3',
            Cell.W2: '2', Cell.W3: '3'}
+
+
+def build_dawg(words):
+    """
+    Returns the arrays of the Lexicon of `words` (see there), merging equal
+    subtrees of the trie while the sorted words are added, so that the full
+    trie is never built.
+    """
+    words = sorted(set(words))
+    alphabet = "".join(sorted(set("".join(words))))
+    children = [{}]  # Node: {letter: node}
+    final = [False]
+    needs = [0]
+    register = {}  # (final, edges): merged node with those edges
+    unchecked = []  # (parent, letter, node) of the last word, still unmerged
+    prev = ""
+    count = 0
+
+    def need(node):
+        # Letters found in all the suffixes of the words below node
+        if final[node]:
+            return 0
+        mask = (1 << len(alphabet)) - 1
+        for letter, child in children[node].items():
+            mask &= 1 << alphabet.index(letter) | needs[child]
+        return mask
+
+    def merge(depth):
+        while len(unchecked) > depth:
+            parent, letter, node = unchecked.pop()
+            needs[node] = need(node)
+            key = (final[node], tuple(children[node].items()))
+            same = register.setdefault(key, node)
+            if same != node:
+                children[parent][letter] = same
+                children[node] = None  # Garbage
+
+    for word in words:
+        if not word:
+            continue
+        common = 0
+        for a, b in zip(word, prev):
+            if a != b:
+                break
+            common += 1
+        merge(common)
+        node = unchecked[-1][2] if unchecked else 0
+        for letter in word[common:]:
+            children.append({})
+            final.append(False)
+            needs.append(0)
+            children[node][letter] = len(children) - 1
+            unchecked.append((node, letter, len(children) - 1))
+            node = len(children) - 1
+        final[node] = True
+        prev = word
+        count += 1
+    merge(0)
+    needs[0] = need(0)
+    # Renumber the nodes left, with flat edge arrays
+    index = {0: 0}
+    order = [0]
+    for node in order:  # Grows while iterating (breadth first)
+        for child in children[node].values():
+            if child not in index:
+                index[child] = len(order)
+                order.append(child)
+    first, labels, targets = array('i', [0]), [], array('i')
+    for node in order:
+        for letter, child in children[node].items():
+            labels.append(letter)
+            targets.append(index[child])
+        first.append(len(targets))
+    final = bytes(final[node] for node in order)
+    needs = array('q', (needs[node] for node in order))
+    return first, "".join(labels), targets, final, alphabet, needs, count
+
+
+class Lexicon:
+    """
+    Immutable set of uppercase words, stored as a DAWG (directed acyclic word
+    graph: a trie with equal subtrees merged) in a few flat arrays, with no
+    object per word or node. It is much smaller than a set of strings and,
+    being made of a few big objects, stays shared between forked processes.
+    Node 0 is the root (the empty prefix); the edges leaving node v are the
+    ones from first[v] to first[v + 1] (excluded), sorted by letter, with the
+    letter in labels and the node reached in targets; final[v] tells whether
+    a word ends in v. Besides membership, it answers prefix and pattern
+    queries, and its nodes can be walked one letter at a time (see child).
+    The letters of the words are also indexed by node: needs[v] is the set of
+    the letters that all the words below v still need (as a bitmask, with
+    bit k for letter alphabet[k]), so a walk can stop as soon as they cannot
+    be found (see formable).
+    """
+
+    def __init__(self, words=(), arrays=None):
+        if arrays is None:
+            arrays = build_dawg(words)
+        (self.first, self.labels, self.targets, self.final, self.alphabet,
+         self.needs, self.size) = arrays
+
+    @classmethod
+    def from_state(cls, state):
+        """Returns the Lexicon with the given state (see state)."""
+        first, labels, targets, final, alphabet, needs, size = state
+        first_a, targets_a, needs_a = array('i'), array('i'), array('q')
+        first_a.frombytes(first)
+        targets_a.frombytes(targets)
+        needs_a.frombytes(needs)
+        return cls(arrays=(first_a, labels, targets_a, final, alphabet,
+                           needs_a, size))
+
+    def state(self):
+        """Returns the arrays as a tuple of bytes, str and int (marshalable)."""
+        return (self.first.tobytes(), self.labels, self.targets.tobytes(),
+                self.final, self.alphabet, self.needs.tobytes(), self.size)
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, word):
+        node = self.walk(word) if isinstance(word, str) else -1
+        return node >= 0 and self.final[node] != 0
+
+    def __iter__(self):
+        return self.words()
+
+    def letter_mask(self, letters):
+        """Returns the bitmask of the letters (see needs)."""
+        mask = 0
+        for letter in letters:
+            k = self.alphabet.find(letter)
+            if k >= 0:
+                mask |= 1 << k
+        return mask
+
+    def formable(self, letters):
+        """
+        Yields, in alphabetical order, the words that can be formed with the
+        given letters, each used at most as many times as it appears, "*"
+        being a jolly that replaces any of them: e.g. the words that the
+        letter cards and the letters of a line of the table can form.
+        """
+        counts = {}
+        for letter in letters:
+            counts[letter] = counts.get(letter, 0) + 1
+        jollies = counts.pop("*", 0)
+        first, labels, targets = self.first, self.labels, self.targets
+
+        def walk(node, prefix, jollies):
+            if self.final[node] and prefix:
+                yield prefix
+            for k in range(first[node], first[node + 1]):
+                letter, child = labels[k], targets[k]
+                card = counts.get(letter, 0) > 0  # Else a jolly
+                if not card and not jollies:
+                    continue
+                if card:
+                    counts[letter] -= 1
+                left = jollies if card else jollies - 1
+                mask = self.letter_mask(x for x, c in counts.items() if c)
+                if bin(self.needs[child] & ~mask).count("1") <= left:
+                    yield from walk(child, prefix + letter, left)
+                if card:
+                    counts[letter] += 1
+
+        yield from walk(0, "", jollies)
+
+    def child(self, node, letter):
+        """Returns the node reached from `node` by `letter`, -1 if none."""
+        k = self.labels.find(letter, self.first[node], self.first[node + 1])
+        return -1 if k < 0 else self.targets[k]
+
+    def edges(self, node):
+        """Yields (letter, child node) for the edges leaving `node`."""
+        for k in range(self.first[node], self.first[node + 1]):
+            yield self.labels[k], self.targets[k]
+
+    def walk(self, prefix, node=0):
+        """Returns the node reached from `node` by `prefix`, -1 if none."""
+        first, labels, targets = self.first, self.labels, self.targets
+        for letter in prefix:
+            k = labels.find(letter, first[node], first[node + 1])
+            if k < 0:
+                return -1
+            node = targets[k]
+        return node
+
+    def words(self, node=0, prefix=""):
+        """
+        Yields, in alphabetical order, `prefix` + the suffixes of the words
+        ending below `node`.
+        """
+        first, labels, targets, final = (self.first, self.labels,
+                                          self.targets, self.final)
+        stack = [(node, prefix)]
+        while stack:
+            node, prefix = stack.pop()
+            if final[node]:
+                yield prefix
+            for k in range(first[node + 1] - 1, first[node] - 1, -1):
+                stack.append((targets[k], prefix + labels[k]))
+
+    def starting_with(self, prefix):
+        """Yields the words starting with `prefix`, in alphabetical order."""
+        node = self.walk(prefix)
+        if node >= 0:
+            yield from self.words(node, prefix)
+
+    def matching(self, pattern, wildcard="."):
+        """
+        Yields, in alphabetical order, the words as long as `pattern` with its
+        letters in the same places, `wildcard` matching any letter: e.g. the
+        words through the letters of a board line, as "..A.E".
+        """
+        first, labels, targets, final = (self.first, self.labels,
+                                          self.targets, self.final)
+        stack = [(0, "")]
+        while stack:
+            node, prefix = stack.pop()
+            if len(prefix) == len(pattern):
+                if final[node]:
+                    yield prefix
+                continue
+            letter = pattern[len(prefix)]
+            if letter != wildcard:
+                k = labels.find(letter, first[node], first[node + 1])
+                if k >= 0:
+                    stack.append((targets[k], prefix + letter))
+                continue
+            for k in range(first[node + 1] - 1, first[node] - 1, -1):
+                stack.append((targets[k], prefix + labels[k]))
+
+
+# Version of the compiled dictionary cache format
+DICT_CACHE_VERSION = 3
+
+
+def dict_cache_dir():
+    """Directory of the compiled dictionary caches."""
+    base = os.environ.get("XDG_CACHE_HOME") or join(expanduser("~"), ".cache")
+    return join(base, "scrabblesolver")
+
+
+def load_dict(paths, word_filter, subs, extra, cache_name):
+    """
+    Returns the Lexicon of the uppercase words found in the dictionary files in
+    `paths` (missing ones are skipped) matching the regex `word_filter`, after
+    replacing each key of `subs` with its value, plus the words in `extra`.
+    The lexicon is compiled into the binary file `cache_name` in
+    dict_cache_dir, keyed by path, size and modification time of the files (and
+    by filter, substitutions and extra words), so later loads just read it
+    back.
+    """
+    sources = []
+    for fp in paths:
+        if isfile(fp):
+            st = os.stat(fp)
+            sources.append((abspath(fp), st.st_size, st.st_mtime_ns))
+    key = (DICT_CACHE_VERSION, tuple(sources), word_filter.pattern,
+           tuple(sorted(subs.items())), tuple(sorted(extra)))
+    cache = join(dict_cache_dir(), cache_name)
+    try:
+        with open(cache, "rb") as ifs:
+            cached_key, state = marshal.loads(ifs.read())
+        if cached_key == key:
+            return Lexicon.from_state(state)
+    except (OSError, EOFError, ValueError, TypeError):
+        pass  # No valid cache, build it
+    words = set(extra)
+    for fp, _, _ in sources:
+        with open(fp) as ifs:
+            for word in ifs:
+                word = word.strip()  # Cut blanks and newlines
+                if word_filter.search(word) is not None:
+                    for k, v in subs.items():
+                        word = word.replace(k, v)
+                    words.add(word.upper())
+    lexicon = Lexicon(words)
+    try:
+        os.makedirs(dirname(cache), exist_ok=True)
+        tmp = "{}.{}.tmp".format(cache, os.getpid())
+        with open(tmp, "wb") as ofs:
+            marshal.dump((key, lexicon.state()), ofs)
+        os.replace(tmp, cache)
+    except OSError:
+        pass  # Cache not writable, the dictionary is parsed every time
+    return lexicon
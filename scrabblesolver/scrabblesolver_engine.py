@@ -0,0 +1,658 @@
+#!/usr/bin/env python3
+# Move generator of the Scrabble solver, in the style of Appel and Jacobson
+# ("The world's fastest Scrabble program", 1988): words are grown from the
+# anchors (the empty cells next to a letter on the table, or the beginning
+# cell) one letter at a time along the lexicon (see Lexicon), with the letter
+# cards or the letters already on the table, so only the placements that can
+# actually be played are visited. Vertical words are found as horizontal ones
+# on the transposed table.
+# Words are scored as the old finder did: letter and word multipliers count
+# for the letters already on the table too, jollies (placed or on the table)
+# are worth no points, and the extra points depend on how many cards are used
+# and on whether the word has jollies. Words formed perpendicularly must be in
+# the dictionary and are scored the same way.
+# As a script, it finds the best moves of the positions in JSON lines files
+# (see main), writing them as JSON lines.
+import argparse
+import heapq
+import json
+import multiprocessing
+import sys
+import threading
+import time
+from importlib import import_module
+
+from scrabblesolver_common import Cell
+
+__ALL__ = ['Board', 'MoveSearch', 'TopMoves', 'find_moves', 'merge_best',
+           'parse_board', 'search_lines']
+
+LETTER_MUL = {Cell.L2: 2, Cell.L3: 3}
+WORD_MUL = {Cell.W2: 2, Cell.W3: 3}
+
+
+def transpose(rows):
+    """Returns the transpose of a list of lists."""
+    return [list(col) for col in zip(*rows)]
+
+
+class LangTables:
+    """
+    Scoring tables of a language module, compiled once (see lang_tables) and
+    shared by all the boards: per-cell lists indexed by [vert][line][cell]
+    (as in Board) of the word multipliers (wmul), of the letter values
+    already multiplied by the letter multiplier of the cell (values, dicts
+    letter: points shared by the cells with the same multiplier) and of the
+    beginning cells, the extra points by number of cards used (lists, as long
+    as the longest word), and the bit of each letter in the lexicon masks.
+    """
+    # Attributes of the language module the tables are compiled from
+    SOURCES = ("POINTS", "TABLE", "EXTRA_N", "EXTRA_NJ", "EXTRA_W", "DICT")
+
+    def __init__(self, lang):
+        self.sources = tuple(getattr(lang, name) for name in self.SOURCES)
+        def both(rows):
+            return rows, transpose(rows)
+
+        scaled = {m: {x: p * m for x, p in lang.POINTS.items()}
+                  for m in set(LETTER_MUL.values()) | {1}}
+        self.values = both([[scaled[LETTER_MUL.get(c, 1)] for c in row]
+                            for row in lang.TABLE])
+        self.wmul = both([[WORD_MUL.get(c, 1) for c in row]
+                          for row in lang.TABLE])
+        self.begin = both([[c == Cell.BEGIN for c in row]
+                           for row in lang.TABLE])
+        size = max(len(lang.TABLE), len(lang.TABLE[0])) + 1
+        self.extra_n = [lang.EXTRA_N.get(k, 0) for k in range(size)]
+        self.extra_nj = [lang.EXTRA_NJ.get(k, 0) for k in range(size)]
+        self.extra_w = lang.EXTRA_W
+        alphabet = lang.DICT.alphabet
+        self.bits = {x: 1 << k for k, x in enumerate(alphabet)}
+
+    def compiled_from(self, lang):
+        """Returns True if the tables are those of the language module."""
+        return all(getattr(lang, name) is source
+                   for name, source in zip(self.SOURCES, self.sources))
+
+
+def lang_tables(lang):
+    """
+    Returns the LangTables of the language module `lang`, kept as its
+    attribute _lang_tables and compiled again if the module has other tables
+    or another lexicon (e.g. after a reload).
+    """
+    tables = getattr(lang, "_lang_tables", None)
+    if tables is None or not tables.compiled_from(lang):
+        tables = lang._lang_tables = LangTables(lang)
+    return tables
+
+
+def merge_best(best, moves):
+    """
+    Updates `best`, a dict word: (jollys, starty, startx, vert, points), with
+    the moves (points, word, jollys, starty, startx, vert) scoring more than
+    the placement already kept for their word.
+    """
+    for pts, w, js, i, j, vert in moves:
+        if w not in best or best[w][-1] < pts:
+            best[w] = (js, i, j, vert, pts)
+
+
+def search_lines(task):
+    """
+    Returns the list of (vert, line, moves) for a task (board, cards, lines)
+    of a process pool: the moves found in each of the lines (see line_moves).
+    """
+    board, cards, lines = task
+    return [(vert, n, board.line_moves(vert, n, cards)) for vert, n in lines]
+
+
+class TopMoves:
+    """
+    The `size` best words found so far, each with its best placement (as in
+    merge_best), filled by a search thread while another one reads them.
+    The heap holds (points, word) for the words kept, plus stale entries of
+    words since replaced or improved, dropped when they reach the top.
+    """
+
+    def __init__(self, size=100):
+        self.size = size
+        self.best = {}  # Word: (jollys, starty, startx, vert, points)
+        self.heap = []
+        self.lock = threading.Lock()
+
+    def add(self, moves):
+        """Adds the moves (points, word, jollys, starty, startx, vert)."""
+        if self.size <= 0:
+            return
+        with self.lock:
+            best, heap = self.best, self.heap
+            for pts, w, js, i, j, vert in moves:
+                if w in best:
+                    if best[w][-1] < pts:
+                        best[w] = (js, i, j, vert, pts)
+                        heapq.heappush(heap, (pts, w))
+                    continue
+                if len(best) >= self.size:
+                    while heap[0][1] not in best or (best[heap[0][1]][-1] !=
+                                                     heap[0][0]):
+                        heapq.heappop(heap)  # Stale
+                    if heap[0][0] >= pts:
+                        continue
+                    del best[heapq.heappop(heap)[1]]
+                best[w] = (js, i, j, vert, pts)
+                heapq.heappush(heap, (pts, w))
+
+    def sorted(self):
+        """
+        Returns the list of the words kept, as (word, jollys, starty, startx,
+        vert, points), from the best one.
+        """
+        with self.lock:
+            words = [(w, *move) for w, move in self.best.items()]
+        words.sort(key=lambda x: -x[-1])
+        return words
+
+
+class MoveSearch(threading.Thread):
+    """
+    Background search of the moves of a Board with the letter cards `cards`,
+    line by line, into the TopMoves `top`, which can be read while the search
+    runs. The board must not change until the search ends (see stop).
+    The lines whose moves the board keeps from a previous search with the
+    same cards (see Board.line_moves) are not searched again.
+    If a multiprocessing `pool` is given, the other lines are split in
+    `chunks` tasks (interleaved, for similar loads) searched by its
+    processes, which share the lexicon (loaded by the module of the language)
+    with the parent process if they are forked.
+    """
+
+    def __init__(self, board, cards, size=100, pool=None, chunks=8):
+        super().__init__(daemon=True)
+        self.board = board
+        self.cards = cards
+        self.top = TopMoves(size)
+        self.lines = board.lines()
+        self.lines_done = 0
+        self.stopped = threading.Event()
+        self.pool = pool
+        self.chunks = chunks
+
+    def run(self):
+        if self.pool is not None:
+            board, cards = self.board, self.cards
+            todo = []
+            for vert, n in self.lines:
+                moves = board.cached_moves(vert, n, cards)
+                if moves is None:
+                    todo.append((vert, n))
+                else:
+                    self.top.add(moves)
+                    self.lines_done += 1
+            chunks = min(self.chunks, len(todo))
+            tasks = [(board, cards, todo[c::chunks]) for c in range(chunks)]
+            for found in self.pool.imap_unordered(search_lines, tasks):
+                if self.stopped.is_set():
+                    break  # The tasks left are not waited for
+                for vert, n, moves in found:
+                    board.cache_moves(vert, n, cards, moves)
+                    self.top.add(moves)
+                self.lines_done += len(found)
+            return
+        for vert, n in self.lines:
+            if self.stopped.is_set():
+                break
+            self.top.add(self.board.line_moves(vert, n, self.cards))
+            self.lines_done += 1
+
+    def progress(self):
+        """Returns the fraction of the lines searched."""
+        return self.lines_done / len(self.lines)
+
+    def stop(self):
+        """Stops the search, waiting for the line being searched."""
+        self.stopped.set()
+        self.join()
+
+
+class Board:
+    """
+    The table of a game (`table` of letters, " " for empty cells, and `tabj`
+    telling which are jollies) seen by the move generator in both directions:
+    the lines along which words are formed are the rows (vert = False) or the
+    columns (vert = True). All the per-line lists are indexed by [vert][line].
+    The cross-checks of the cells are kept up to date by set, which must be
+    used to change the table, and so are the moves found in each line with
+    the last cards searched (see line_moves): set forgets those of the lines
+    whose letters or cross-checks change.
+    """
+
+    def __init__(self, lang, table, tabj):
+        self.lang = lang
+        self.tables = lang_tables(lang)
+        self.letters = ([list(row) for row in table], transpose(table))
+        self.jollys = ([list(row) for row in tabj], transpose(tabj))
+        # Cross-checks of the empty cells, see cross_check
+        self.checks = tuple(
+            [[self.cross_check(vert, n, k) for k in range(len(line))]
+             for n, line in enumerate(self.letters[vert])]
+            for vert in (False, True))
+        self.cards = None  # Cards of the moves in self.found
+        self.found = {}  # (vert, line): moves
+
+    def cross_check(self, vert, n, k):
+        """
+        Returns None if the cell k of the line n has no letters next to it
+        perpendicularly, otherwise (allowed, base, wmul) for the word formed
+        perpendicularly by a letter put there: allowed are the letters that
+        make it a known word, base the points of its other letters and wmul
+        the product of their word multipliers.
+        """
+        perp = self.letters[not vert][k]
+        if perp[n] != " ":
+            return None
+        a = n
+        while a > 0 and perp[a - 1] != " ":
+            a -= 1
+        b = n + 1
+        while b < len(perp) and perp[b] != " ":
+            b += 1
+        if b - a == 1:
+            return None
+        lexicon = self.lang.DICT
+        suffix = "".join(perp[n + 1:b])
+        node = lexicon.walk(perp[a:n])
+        allowed = ""
+        if node >= 0:
+            for x, child in lexicon.edges(node):
+                child = lexicon.walk(suffix, child)
+                if child >= 0 and lexicon.final[child]:
+                    allowed += x
+        jollys = self.jollys[not vert][k]
+        values = self.tables.values[not vert][k]
+        wmul = self.tables.wmul[not vert][k]
+        base, mul = 0, 1
+        for c in range(a, b):
+            if c != n:
+                if not jollys[c]:
+                    base += values[c][perp[c]]
+                mul *= wmul[c]
+        return allowed, base, mul
+
+    def __getstate__(self):
+        # The language module is pickled by name (for process pools)
+        state = dict(self.__dict__)
+        state["lang"] = self.lang.__name__
+        del state["tables"]
+        state["cards"], state["found"] = None, {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lang = import_module(self.lang)
+        self.tables = lang_tables(self.lang)
+
+    def set(self, i, j, letter, jolly=False):
+        """
+        Puts `letter` (" " to clear it) in the cell (i, j) of the table, as a
+        jolly if `jolly`, recomputing the cross-checks of the cells whose
+        perpendicular words change: the cell itself and the first empty ones
+        past the letters before and after it, in its row and in its column.
+        The moves kept of the row, of the column and of the lines of the
+        cross-checks changed are forgotten.
+        """
+        if (self.letters[False][i][j], self.jollys[False][i][j]) == (letter,
+                                                                    jolly):
+            return
+        for vert, n, k in ((False, i, j), (True, j, i)):
+            self.letters[vert][n][k] = letter
+            self.jollys[vert][n][k] = jolly
+            self.found.pop((vert, n), None)
+        for vert, n, k in ((False, i, j), (True, j, i)):
+            perp = self.letters[not vert][k]
+            cells = [n]
+            a = n - 1
+            while a >= 0 and perp[a] != " ":
+                a -= 1
+            b = n + 1
+            while b < len(perp) and perp[b] != " ":
+                b += 1
+            cells += [c for c in (a, b) if 0 <= c < len(perp)]
+            for c in cells:
+                check = self.cross_check(vert, c, k)
+                if check != self.checks[vert][c][k]:
+                    self.checks[vert][c][k] = check
+                    self.found.pop((vert, c), None)
+
+    def anchors(self, vert, n):
+        """Returns the anchors of the line n: the cells a word must cover."""
+        letters, checks = self.letters[vert][n], self.checks[vert][n]
+        begin = self.tables.begin[vert][n]
+        return [k for k, x in enumerate(letters) if x == " " and (
+            checks[k] is not None or begin[k] or
+            k > 0 and letters[k - 1] != " " or
+            k < len(letters) - 1 and letters[k + 1] != " ")]
+
+    def placements(self, vert, n, cards):
+        """
+        Returns the list of (start, word, jollys) of the words that can be put
+        in the line n with the letter cards `cards` ("*" for jollies), jollys
+        telling which letters of the word are jollies.
+        """
+        lexicon = self.lang.DICT
+        first, labels = lexicon.first, lexicon.labels
+        targets, final = lexicon.targets, lexicon.final
+        needs, bits = lexicon.needs, self.tables.bits
+        letters, on_table = self.letters[vert][n], self.jollys[vert][n]
+        checks = self.checks[vert][n]
+        size = len(letters)
+        # Cards left: counts by letter, how many and their letters (mask)
+        counts = {}
+        for x in cards:
+            counts[x] = counts.get(x, 0) + 1
+        jollies = counts.pop("*", 0)
+        left_cards = len(cards)
+        # Letters at hand: those of the line and of the cards left. A walk
+        # stops at the nodes whose words all need other letters (see needs)
+        # than the jollies left can replace
+        line_mask = card_mask = 0
+        for x in letters:
+            line_mask |= bits.get(x, 0)
+        for x in counts:
+            card_mask |= bits.get(x, 0)
+        found = []
+        word, jollys = [], []
+
+        def play(e, then, *args):
+            # Puts the letter of edge e with a card, then with a jolly
+            nonlocal jollies, card_mask, left_cards
+            x = labels[e]
+            node = targets[e]
+            word.append(x)
+            left_cards -= 1
+            count = counts.get(x)
+            if count:
+                counts[x] = count - 1
+                if count == 1:
+                    card_mask ^= bits[x]
+                missing = needs[node] & ~(line_mask | card_mask)
+                if not missing or jollies and (bin(missing).count("1") <=
+                                               jollies):
+                    jollys.append(False)
+                    then(node, *args)
+                    jollys.pop()
+                if count == 1:
+                    card_mask ^= bits[x]
+                counts[x] = count
+            if jollies:
+                jollies -= 1
+                missing = needs[node] & ~(line_mask | card_mask)
+                if not missing or jollies and (bin(missing).count("1") <=
+                                               jollies):
+                    jollys.append(True)
+                    then(node, *args)
+                    jollys.pop()
+                jollies += 1
+            left_cards += 1
+            word.pop()
+
+        def extend(node, k, anchor):
+            # Grows the word rightwards from cell k, past the anchor
+            if k == size or letters[k] == " ":
+                if k > anchor and final[node]:
+                    found.append((k - len(word), "".join(word),
+                                  tuple(jollys)))
+                if k == size or not left_cards:
+                    return
+                check = checks[k]
+                for e in range(first[node], first[node + 1]):
+                    if check is None or labels[e] in check[0]:
+                        play(e, extend, k + 1, anchor)
+            else:
+                e = labels.find(letters[k], first[node], first[node + 1])
+                if e >= 0:
+                    word.append(letters[k])
+                    jollys.append(on_table[k])
+                    extend(targets[e], k + 1, anchor)
+                    jollys.pop()
+                    word.pop()
+
+        def left(node, limit, anchor):
+            # Grows the part of the word left of the anchor, made of cards
+            extend(node, anchor, anchor)
+            if limit > 0:
+                for e in range(first[node], first[node + 1]):
+                    play(e, left, limit - 1, anchor)
+
+        anchors = self.anchors(vert, n)
+        for anchor in anchors:
+            if anchor > 0 and letters[anchor - 1] != " ":
+                # The letters on the left are part of the word
+                a = anchor - 1
+                while a > 0 and letters[a - 1] != " ":
+                    a -= 1
+                node = lexicon.walk(letters[a:anchor])
+                if node >= 0:
+                    word[:], jollys[:] = letters[a:anchor], on_table[a:anchor]
+                    extend(node, anchor, anchor)
+                    word[:], jollys[:] = [], []
+                continue
+            # Empty cells on the left, up to the previous anchor
+            limit = 0
+            while (limit < anchor and letters[anchor - limit - 1] == " " and
+                   anchor - limit - 1 not in anchors):
+                limit += 1
+            left(0, min(limit, len(cards) - 1), anchor)
+        return found
+
+    def score(self, vert, n, start, word, jollys):
+        """
+        Returns the points of the word put at `start` in the line n (see
+        placements), with the words formed perpendicularly.
+        """
+        tables = self.tables
+        letters, checks = self.letters[vert][n], self.checks[vert][n]
+        values, wmul = tables.values[vert][n], tables.wmul[vert][n]
+        points, mul, cross, used, jolly = 0, 1, 0, 0, False
+        c = start
+        for x, j in zip(word, jollys):
+            if j:
+                value, jolly = 0, True
+            else:
+                value = values[c][x]
+            points += value
+            mul *= wmul[c]
+            if letters[c] == " ":
+                used += 1
+                check = checks[c]
+                if check is not None:
+                    cross += (check[1] + value) * check[2] * wmul[c]
+            c += 1
+        extra = tables.extra_nj if jolly else tables.extra_n
+        extra = extra[used] if used < len(extra) else 0
+        return points * mul + cross + extra + tables.extra_w.get(word, 0)
+
+    def cached_moves(self, vert, n, cards):
+        """
+        Returns the moves of the line n with the letter cards `cards` kept
+        from a previous search (see line_moves), None if there are none.
+        """
+        if cards != self.cards:
+            return None
+        return self.found.get((vert, n))
+
+    def cache_moves(self, vert, n, cards, moves):
+        """
+        Keeps the moves of the line n with the letter cards `cards`,
+        forgetting those of all the lines if the cards are not the last ones.
+        """
+        if cards != self.cards:
+            self.cards = cards
+            self.found = {}
+        self.found[(vert, n)] = moves
+
+    def line_moves(self, vert, n, cards):
+        """
+        Returns the moves (points, word, jollys, starty, startx, vert) of the
+        line n with the letter cards `cards`. They are kept until the line
+        changes (see set) or other cards are searched, and must not be
+        modified.
+        """
+        moves = self.cached_moves(vert, n, cards)
+        if moves is not None:
+            return moves
+        moves = []
+        for start, word, jollys in self.placements(vert, n, cards):
+            pts = self.score(vert, n, start, word, jollys)
+            i, j = (start, n) if vert else (n, start)
+            moves.append((pts, word, list(jollys), i, j, vert))
+        self.cache_moves(vert, n, cards, moves)
+        return moves
+
+    def lines(self):
+        """Returns the (vert, line) of all the lines of the table."""
+        return [(vert, n) for vert in (False, True)
+                for n in range(len(self.letters[vert]))]
+
+    def moves(self, cards):
+        """Yields the moves of all the lines (see line_moves)."""
+        for vert, n in self.lines():
+            yield from self.line_moves(vert, n, cards)
+
+
+def find_moves(board, jolly_mask, rack, lang, top_k=None):
+    """
+    Returns the best placement of each word that can be played on `board`
+    (rows of letters, " " for empty cells) with the letter cards `rack` ("*"
+    for jollies), `jolly_mask` telling which letters of the board are jollies
+    (None if none is), in the language module `lang`. The result is a list of
+    (word, jollys, starty, startx, vert, points), from the best, with only the
+    top_k best words if top_k is not None.
+    """
+    if top_k is not None and top_k < 1:
+        raise ValueError("top_k must be positive, not {}!".format(top_k))
+    if jolly_mask is None:
+        jolly_mask = [[False] * len(row) for row in board]
+    moves = Board(lang, board, jolly_mask).moves(rack)
+    if top_k is not None:
+        top = TopMoves(top_k)
+        top.add(moves)
+        return top.sorted()
+    best = {}
+    merge_best(best, moves)
+    return sorted(((w, *move) for w, move in best.items()),
+                  key=lambda x: -x[-1])
+
+
+def parse_board(rows, lang):
+    """
+    Returns (board, jolly_mask) for find_moves from a list of strings, one per
+    row of the table of `lang`, with uppercase letters for letter cards,
+    lowercase ones for jollies and "." or " " for empty cells.
+    """
+    if len(rows) != len(lang.TABLE) or any(len(row) != len(lang.TABLE[0])
+                                           for row in rows):
+        raise ValueError("The table must be {}x{}!".format(
+            len(lang.TABLE), len(lang.TABLE[0])))
+    board, jolly_mask = [], []
+    for row in rows:
+        board.append([" " if x in ". " else x.upper() for x in row])
+        jolly_mask.append([x.islower() for x in row])
+        if any(x != " " and (x not in lang.LETTERS or x == "*")
+               for x in board[-1]):
+            raise ValueError("Invalid row {!r}!".format(row))
+    return board, jolly_mask
+
+
+# Batch search
+_batch_config = None  # (language module, top_k) in the worker processes
+
+
+def batch_init(lang_name, top_k):
+    """Initializes a batch worker process, loading the language."""
+    global _batch_config
+    _batch_config = (import_module("scrabblesolver_" + lang_name), top_k)
+
+
+def batch_line(line):
+    """
+    Returns the response line to a position line, a JSON object like
+      {"id": 1, "board": [".....", ...], "rack": "ABC*", "top": 10}
+    (see parse_board, id and top are optional) answered with a JSON object
+    holding the same id and the moves, as objects with word, row, col, vert,
+    points and the indices of the jollies in the word, or an error message.
+    """
+    lang, top_k = _batch_config
+    rid = None
+    try:
+        req = json.loads(line)
+        rid = req.get("id")
+        board, jolly_mask = parse_board(req["board"], lang)
+        rack = req["rack"].upper()
+        if any(x not in lang.LETTERS for x in rack):
+            raise ValueError("Invalid rack {!r}!".format(rack))
+        top = req.get("top", top_k)
+        if not isinstance(top, int) or isinstance(top, bool) or top < 1:
+            raise ValueError("Invalid top {!r}!".format(top))
+        moves = find_moves(board, jolly_mask, rack, lang, top)
+        res = {"moves": [{"word": w, "row": i, "col": j, "vert": vert,
+                          "points": pts,
+                          "jollys": [k for k, jolly in enumerate(js)
+                                     if jolly]}
+                         for w, js, i, j, vert, pts in moves]}
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        res = {"error": "{}: {}".format(type(e).__name__, e)}
+    return json.dumps(dict(res, id=rid))
+
+
+def main(argv=None):
+    """Command line interface (see --help)."""
+    parser = argparse.ArgumentParser(description="Find the best Scrabble "
+                                     "moves of the positions in JSON lines "
+                                     "files, writing them as JSON lines.")
+    parser.add_argument("files", nargs="*", default=["-"],
+                        help="files of positions, one JSON object per line "
+                        "(default: the standard input)")
+    parser.add_argument("-l", "--lang", default="it",
+                        help="language (default: %(default)s)")
+    parser.add_argument("-k", "--top", type=int, default=10,
+                        help="best words written per position (default: "
+                        "%(default)s)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes (default: "
+                        "%(default)s, 0 means one per CPU)")
+    args = parser.parse_args(argv)
+    if args.top < 1:
+        parser.error("the number of best words must be positive")
+
+    def read_lines():
+        for fn in args.files:
+            ifs = sys.stdin if fn == "-" else open(fn)
+            with ifs:
+                for line in ifs:
+                    if line.strip() and not line.startswith("#"):
+                        yield line
+
+    start = time.perf_counter()
+    lines = read_lines()
+    if args.jobs == 1:
+        batch_init(args.lang, args.top)
+        results = map(batch_line, lines)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(args.jobs or None, batch_init,
+                                    (args.lang, args.top))
+        results = pool.imap(batch_line, lines, 4)
+    n = 0
+    try:
+        for n, res in enumerate(results, 1):
+            print(res)
+    finally:
+        if pool is not None:
+            pool.terminate()
+    print("{} positions in {:.3f} s.".format(n, time.perf_counter() - start),
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
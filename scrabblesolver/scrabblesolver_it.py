@@ -1,7 +1,7 @@
 # Configuration file for solving Scrabble in italian.
-from scrabblesolver_common import Cell
+from scrabblesolver_common import Cell, load_dict
 import re
-from os.path import join, isfile, dirname, abspath
+from os.path import join, dirname, abspath
 
 __ALL__ = ['DICT', 'LETTERS', 'POINTS', 'TABLE']
 
@@ -15,24 +15,15 @@ DICTFN = ["/usr/share/dict/italian",
 RE_DICT_FILTER = re.compile(r'^[abcdefghilmnopqrstuvzàèéìòù]{2,17}$')
 # Dictionary letter substitution (aka accent removal)
 DICT_SUBS = {'à': 'a', 'è' : 'e', 'é': 'e', 'ì': 'i', 'ò': 'o', 'ù': 'u'}
-# Dictionary loading
-DICT = set()
-for fp in DICTFN:
-    if isfile(fp):
-        with open(fp) as ifs:
-            for word in ifs:
-                word = word.strip()  # Cut blanks and newlines
-                if RE_DICT_FILTER.search(word) is not None:
-                    for k, v in DICT_SUBS.items():
-                        word = word.replace(k, v)
-                    DICT.add(word.upper())
-if len(DICT) == 0:
-    raise RuntimeError("No dictionary file was found.")
 # Special words allowed (acronyms, etc.)
-DICT |= {  # Set in-place union
+DICT_EXTRA = {
     # TODO aggiungere targhe, sigle degli stati, etc.
     'AN'
 }
+# Dictionary loading, as a Lexicon (from the compiled cache if up to date)
+DICT = load_dict(DICTFN, RE_DICT_FILTER, DICT_SUBS, DICT_EXTRA, "it.dict")
+if len(DICT) <= len(DICT_EXTRA):
+    raise RuntimeError("No dictionary file was found.")
 
 # How many of each letter
 LETTERS = {
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# Regression checks of the move generator, run with pytest or as a script:
+# random games on a small table with a small random lexicon (no dictionary
+# file needed) are checked against a brute-force scan of all the placements
+# and against boards rebuilt from scratch after each change.
+import random
+import types
+
+from scrabblesolver_common import Cell, Lexicon
+from scrabblesolver_engine import Board, find_moves
+
+SIZE = 9
+
+
+def make_lang(seed=1, letters="AEIORSTN"):
+    """
+    Returns a language module with a random lexicon of the given letters on
+    a 9x9 table.
+    """
+    rng = random.Random(seed)
+    lang = types.ModuleType("scrabblesolver_check")
+    lang.LETTERS = {'A': 6, 'E': 6, 'I': 4, 'O': 4, 'R': 3, 'S': 3, 'T': 3,
+                    'N': 2, '*': 2}
+    lang.POINTS = {'*': 0, 'A': 1, 'E': 1, 'I': 1, 'O': 1, 'R': 2, 'S': 2,
+                   'T': 2, 'N': 3}
+    rows = ("W   l   W", " w  L  w ", "  l   l  ", "   w w   ", "l   B   l",
+            "   w w   ", "  l   l  ", " w  L  w ", "W   l   W")
+    cells = {' ': Cell.SIMPLE, 'B': Cell.BEGIN, 'l': Cell.L2, 'L': Cell.L3,
+             'w': Cell.W2, 'W': Cell.W3}
+    lang.TABLE = [[cells[x] for x in row] for row in rows]
+    lang.NCARDS = 7
+    lang.EXTRA_N = {5: 10, 6: 20, 7: 30}
+    lang.EXTRA_NJ = {5: 5, 6: 15, 7: 25}
+    words = {"".join(rng.choice(letters) for _ in range(rng.randint(2, 6)))
+             for _ in range(1500)}
+    lang.EXTRA_W = {max(words): 50}
+    lang.DICT = Lexicon(words)
+    return lang
+
+
+def random_rack(lang, rng):
+    """Returns 7 random letter cards, with at most one jolly."""
+    bag = [x for x, n in lang.LETTERS.items() for _ in range(n) if x != "*"]
+    rack = rng.sample(bag, 7)
+    if rng.random() < 0.3:
+        rack[0] = "*"
+    return "".join(rack)
+
+
+def lines_of(table, vert):
+    """Returns the rows (or the columns, if vert) of table."""
+    return [list(col) for col in zip(*table)] if vert else table
+
+
+def cross_word(table, vert, n, k, x):
+    """
+    Returns (start, letters) of the word formed perpendicularly to the line n
+    by the letter x in its cell k.
+    """
+    perp = lines_of(table, not vert)[k]
+    a = n
+    while a > 0 and perp[a - 1] != " ":
+        a -= 1
+    b = n + 1
+    while b < len(perp) and perp[b] != " ":
+        b += 1
+    return a, perp[a:n] + [x] + perp[n + 1:b]
+
+
+def brute_placements(lang, table, cards):
+    """Returns the set of (vert, line, start, word) playable with cards."""
+    empty = all(x == " " for row in table for x in row)
+    found = set()
+    for vert in (False, True):
+        mul = lines_of(lang.TABLE, vert)
+        for n, line in enumerate(lines_of(table, vert)):
+            for word in lang.DICT:
+                for start in range(len(line) - len(word) + 1):
+                    end = start + len(word)
+                    if (start > 0 and line[start - 1] != " " or
+                            end < len(line) and line[end] != " "):
+                        continue
+                    used, touches, ok = [], False, True
+                    for k, x in enumerate(word, start):
+                        if line[k] != " ":
+                            ok = line[k] == x
+                            touches = True
+                        else:
+                            used.append(x)
+                            _, cross = cross_word(table, vert, n, k, x)
+                            if len(cross) > 1:
+                                ok = "".join(cross) in lang.DICT
+                                touches = True
+                            touches |= empty and mul[n][k] == Cell.BEGIN
+                        if not ok:
+                            break
+                    if not ok or not used or not touches:
+                        continue
+                    missing = sum(max(0, used.count(x) - cards.count(x))
+                                  for x in set(used))
+                    if missing <= cards.count("*"):
+                        found.add((vert, n, start, word))
+    return found
+
+
+def brute_score(lang, table, tabj, move):
+    """Returns the points of a move, computed word by word."""
+    pts, word, jollys, i, j, vert = move
+    n, start = (j, i) if vert else (i, j)
+    letters = lines_of(table, vert)[n]
+    on_table = lines_of(tabj, vert)
+
+    def points(cells):
+        # cells: (line, cell, letter, jolly) of a word along vert
+        total, mul = 0, 1
+        for m, k, x, jolly in cells:
+            c = lines_of(lang.TABLE, vert)[m][k]
+            total += 0 if jolly else lang.POINTS[x] * {Cell.L2: 2,
+                                                       Cell.L3: 3}.get(c, 1)
+            mul *= {Cell.W2: 2, Cell.W3: 3}.get(c, 1)
+        return total * mul
+
+    total = points([(n, k, x, jolly) for k, (x, jolly)
+                    in enumerate(zip(word, jollys), start)])
+    used = 0
+    for k, (x, jolly) in enumerate(zip(word, jollys), start):
+        if letters[k] != " ":
+            continue
+        used += 1
+        a, cross = cross_word(table, vert, n, k, x)
+        if len(cross) > 1:
+            # Cross words, as seen along the other direction
+            vert = not vert
+            total += points([(k, c, y, jolly if c == n else on_table[k][c])
+                             for c, y in enumerate(cross, a)])
+            vert = not vert
+    extra = lang.EXTRA_NJ if any(jollys) else lang.EXTRA_N
+    return total + extra.get(used, 0) + lang.EXTRA_W.get(word, 0)
+
+
+def play_best(board, moves):
+    """Puts the best of moves on board."""
+    pts, word, jollys, i, j, vert = max(moves)
+    for k, (x, jolly) in enumerate(zip(word, jollys)):
+        board.set(i + k if vert else i, j if vert else j + k, x, jolly)
+
+
+def test_moves_match_brute_force():
+    """Moves are all the placements, scored as word by word."""
+    lang = make_lang()
+    rng = random.Random(2)
+    board = Board(lang, [[" "] * SIZE for _ in range(SIZE)],
+                  [[False] * SIZE for _ in range(SIZE)])
+    for turn in range(8):
+        cards = random_rack(lang, rng)
+        table, tabj = board.letters[False], board.jollys[False]
+        moves = list(board.moves(cards))
+        got = {(vert, j if vert else i, i if vert else j, word)
+               for _, word, _, i, j, vert in moves}
+        assert got == brute_placements(lang, table, cards), (turn, cards)
+        for move in moves:
+            assert move[0] == brute_score(lang, table, tabj, move), move
+        if not moves:
+            break
+        play_best(board, moves)
+
+
+def test_set_matches_fresh_board():
+    """Cross-checks and kept moves stay equal to those of a new Board."""
+    lang = make_lang()
+    rng = random.Random(3)
+    board = Board(lang, [[" "] * SIZE for _ in range(SIZE)],
+                  [[False] * SIZE for _ in range(SIZE)])
+    cards = random_rack(lang, rng)
+    for turn in range(40):
+        if turn % 5 == 0:
+            cards = random_rack(lang, rng)
+        moves = sorted(board.moves(cards))
+        fresh = Board(lang, board.letters[False], board.jollys[False])
+        assert board.checks == fresh.checks, turn
+        assert moves == sorted(fresh.moves(cards)), turn
+        if moves and turn % 2 == 0:
+            play_best(board, moves)
+        else:
+            for _ in range(3):
+                board.set(rng.randrange(SIZE), rng.randrange(SIZE),
+                          rng.choice(" AEST"), rng.random() < 0.2)
+
+
+def test_find_moves_top():
+    """find_moves keeps the best placement of the top_k best words."""
+    lang = make_lang()
+    board = [[" "] * SIZE for _ in range(SIZE)]
+    every = find_moves(board, None, "AERST*", lang)
+    assert find_moves(board, None, "AERST*", lang, 5) == every[:5]
+    try:
+        find_moves(board, None, "AERST*", lang, 0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("top_k 0 accepted")
+
+
+def test_languages_with_the_same_name():
+    """Each language is searched with its own tables, whatever its name."""
+    board = [[" "] * SIZE for _ in range(SIZE)]
+    first, second = make_lang(1), make_lang(4, "AEOST")
+    second.EXTRA_W = {w: 50 for w in second.DICT if len(w) < 4}
+    for lang in (first, second, first):
+        moves = find_moves(board, None, "AERST*", lang)
+        assert {w for w, *_ in moves} == {w for _, _, _, w in
+                                          brute_placements(lang, board,
+                                                           "AERST*")}
+        for w, js, i, j, vert, pts in moves:
+            assert pts == brute_score(lang, board, board,
+                                      (pts, w, js, i, j, vert)), w
+
+
+if __name__ == "__main__":
+    test_moves_match_brute_force()
+    test_set_matches_fresh_board()
+    test_find_moves_top()
+    test_languages_with_the_same_name()
+    print("OK")
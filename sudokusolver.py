@@ -2,28 +2,66 @@
 # Representing a sudoku as a list of lists, the first index being the row and
 # the second being the column (C-ordering, we have a list of rows which are
 # lists of ints). 0 represents an empty cell (to-be-filled).
-# 3x3 boxes are numbered by row (the top-left is k=0, the top-right is k=2, ...,
-# the bottom-left is k=6 and the bottom-right is k=8).
+# A grid has N x N cells holding the numbers 1 to N, with N = n * n (N = 9 for
+# the standard sudoku, 16 and 25 for the larger variants), split in n x n boxes.
+# Boxes are numbered by row (the top-left is k=0, the top-right is k=n-1, ...,
+# the bottom-right is k=N-1).
+import argparse
+import mmap
+import multiprocessing
+import os
+import queue
+import sys
+from collections import deque, namedtuple
 from copy import deepcopy
+from itertools import islice, repeat
+from math import isqrt
 
+# Chars of the cell values in one-char-per-cell formats (10 is A, 11 is B, ...)
+CELL_CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
-def int_cell(x):
-    """Convert a char to a cell representation. Raises exceptions on failure."""
-    if len(x) != 1:
-        raise ValueError("Not a char!")
-    return 0 if x == " " else int(x)
+
+def int_cell(x, size=9):
+    """
+    Convert a char (" ", "." or "0" for an empty cell, see CELL_CHARS for the
+    others) or a multi-char decimal number to a cell representation for a grid
+    of the given size. Raises exceptions on failure.
+    """
+    if len(x) == 0:
+        raise ValueError("Empty string!")
+    if len(x) > 1:
+        x = int(x)
+    elif x in " .":
+        x = 0
+    else:
+        x = CELL_CHARS.index(x.upper())
+    if not 0 <= x <= size:
+        raise ValueError("Out of range!")
+    return x
 
 
-def sudoku_input():
-    """User input to sudoku grid representation. Returns None on failure."""
+def cell_char(x):
+    """Convert a cell representation to a char (see CELL_CHARS)."""
+    return CELL_CHARS[x]
+
+
+def sudoku_input(size=9):
+    """
+    User input to sudoku grid representation. Each row is given as up to size
+    chars or as size whitespace-separated values (see int_cell). Returns None on
+    failure.
+    """
     rows = []
-    for i in range(9):
+    for i in range(size):
         row = input()
-        if len(row) > 9:
-            return None
-        row += " " * (9 - len(row))
+        if len(row) <= size:
+            row += " " * (size - len(row))
+        else:
+            row = row.split()
+            if len(row) != size:
+                return None
         try:
-            row = [int_cell(x) for x in row]
+            row = [int_cell(x, size) for x in row]
         except Exception:
             return None
         rows.append(row)
@@ -32,88 +70,495 @@ def sudoku_input():
 
 def sudoku_print(grid):
     """Prints the grid in a readable form."""
-    for i in range(9):
+    size = len(grid)
+    box = isqrt(size)
+    for i in range(size):
         print("|".join(
-            "".join(str(grid[i][j]) for j in range(3 * n, 3 * n + 3))
-            for n in range(3)
+            "".join(cell_char(grid[i][j]) for j in range(box * n, box * n + box))
+            for n in range(box)
         ))
-        if i % 3 == 2 and i // 3 < 2:
-            print("---+---+---")
+        if i % box == box - 1 and i // box < box - 1:
+            print("+".join(["-" * box] * box))
+
+
+def line_to_grid(line):
+    """
+    Converts a puzzle in the one-line format (the N * N cells row by row, as
+    chars or as values separated by whitespace or commas, see int_cell) to a
+    grid. Raises exceptions on failure.
+    """
+    line = line.strip()
+    if any(x in line for x in " \t,"):
+        cells = line.replace(",", " ").split()
+    else:
+        cells = line
+    size = isqrt(len(cells))
+    if size * size != len(cells):
+        raise ValueError("Not a square grid!")
+    get_layout(size)  # Check the box size
+    return [[int_cell(x, size) for x in cells[size * i:size * i + size]]
+            for i in range(size)]
+
+
+# Compact grids: the N * N cells of a grid, row by row, as a bytes-like object
+# (bytes, bytearray, array("B"), memoryview) holding either the cell values (0
+# for empty) or their chars in the one-line format. A line of a puzzle file is
+# thus a compact grid as it is. Translation table from either to cell values,
+# 255 for invalid bytes.
+COMPACT_VALUES = bytearray(b"\xff" * 256)
+for _x, _c in enumerate(CELL_CHARS):
+    COMPACT_VALUES[_x] = COMPACT_VALUES[ord(_c)] = _x
+    COMPACT_VALUES[ord(_c.lower())] = _x
+COMPACT_VALUES[ord(".")] = 0
+COMPACT_VALUES = bytes(COMPACT_VALUES)
+
+
+def compact_grid(grid):
+    """Converts a grid to a compact grid holding the cell values."""
+    return bytearray(x for row in grid for x in row)
+
+
+def grid_copy(grid):
+    """
+    Returns a copy of grid as a list of lists, grid being either a list of lists
+    or a compact grid. Raises exceptions on invalid compact grids.
+    """
+    if isinstance(grid, list):
+        return [row[:] for row in grid]
+    cells = bytes(grid).translate(COMPACT_VALUES)
+    size = isqrt(len(cells))
+    if size * size != len(cells):
+        raise ValueError("Not a square grid!")
+    get_layout(size)  # Check the box size
+    if cells and max(cells) > size:
+        raise ValueError("Out of range!")
+    return [list(cells[i:i + size]) for i in range(0, len(cells), size)]
+
+
+def map_puzzles(path):
+    """
+    Yields the puzzles of a file in the one-line format (one char per cell,
+    blank lines and lines starting with "#" are skipped) as compact grids,
+    i.e. memoryview slices of the memory-mapped file: no line is copied or
+    decoded. The file stays mapped as long as any of the views is alive.
+    """
+    with open(path, "rb") as ifs:
+        if os.fstat(ifs.fileno()).st_size == 0:
+            return  # Empty files cannot be mapped
+        view = memoryview(mmap.mmap(ifs.fileno(), 0, access=mmap.ACCESS_READ))
+    start, end = 0, len(view)
+    data = view.obj
+    while start < end:
+        stop = data.find(b"\n", start)
+        if stop == -1:
+            stop = end
+        line_end = stop
+        while line_end > start and view[line_end - 1] in b" \t\r":
+            line_end -= 1
+        while start < line_end and view[start] in b" \t":
+            start += 1
+        if start < line_end and view[start] != ord("#"):
+            yield view[start:line_end]
+        start = stop + 1
+
+
+def grid_to_line(grid):
+    """Converts a grid to the one-line format (see line_to_grid)."""
+    if len(grid) < len(CELL_CHARS):
+        return "".join(cell_char(x) for row in grid for x in row)
+    return " ".join(str(x) for row in grid for x in row)
 
 
 def get_row_missing(grid, i):
     """Returns a set of the numbers to be filled in the i-th row of grid."""
-    return set(x + 1 for x in range(9)) - set(grid[i])
+    return set(x + 1 for x in range(len(grid))) - set(grid[i])
 
 
 def get_col_missing(grid, j):
     """Returns a set of the numbers to be filled in the j-th column of grid."""
-    return set(x + 1 for x in range(9)) - set(r[j] for r in grid)
+    return set(x + 1 for x in range(len(grid))) - set(r[j] for r in grid)
 
 
 def box_iter(grid, k):
     """Iterates through the elements of the k-th box of grid."""
-    br, bc = divmod(k, 3)
-    for i in range(3 * br, 3 * br + 3):
-        for j in range(3 * bc, 3 * bc + 3):
+    box = isqrt(len(grid))
+    br, bc = divmod(k, box)
+    for i in range(box * br, box * br + box):
+        for j in range(box * bc, box * bc + box):
             yield grid[i][j]
 
 
 def get_box_missing(grid, k):
     """Returns a set of the numbers to be filled in the k-th box of grid."""
-    return set(x + 1 for x in range(9)) - set(x for x in box_iter(grid, k))
+    return (set(x + 1 for x in range(len(grid))) -
+            set(x for x in box_iter(grid, k)))
 
 
-def get_box_index(i, j):
-    """Returns the index k of the box the cell (i, j) belongs to."""
-    return (i // 3) * 3 + (j // 3)
+def get_box_index(i, j, box=3):
+    """Returns the index k of the box (of box x box cells) of the cell (i, j)."""
+    return (i // box) * box + (j // box)
 
 
-def fill_unique(grid):
+# Geometry of the grids of a given size, built once by get_layout: the size N,
+# the box size n, the bitmask of all the numbers, the box index of each cell
+# and the 3 * N units (rows, columns and boxes, in this order) as lists of cells
+Layout = namedtuple("Layout", "size box all_mask box_index units")
+_layouts = {}
+
+
+def get_layout(size):
+    """Returns the Layout of size x size grids. Raises exceptions on failure."""
+    layout = _layouts.get(size)
+    if layout is None:
+        box = isqrt(size)
+        if size < 1 or box * box != size:
+            raise ValueError("Size is not a square!")
+        box_index = [[get_box_index(i, j, box) for j in range(size)]
+                     for i in range(size)]
+        units = ([[(i, j) for j in range(size)] for i in range(size)] +
+                 [[(i, j) for i in range(size)] for j in range(size)] +
+                 [[(i, j) for i in range(box * br, box * br + box)
+                   for j in range(box * bc, box * bc + box)]
+                  for br in range(box) for bc in range(box)])
+        layout = Layout(size, box, (1 << size + 1) - 2, box_index, units)
+        _layouts[size] = layout
+    return layout
+
+
+# Candidate engine: the numbers already placed in each row, column and box are
+# kept as int bitmasks (bit x is set if number x is present, bit 0 is unused),
+# so the possible values of a cell are found with a couple of bitwise ops. On
+# top of that, each cell has a mask of numbers excluded by deduction rules.
+# Lookup tables indexed by mask (for 9x9 grids, larger masks are handled by
+# mask_count and mask_values): how many numbers and which numbers it holds
+MASK_COUNT = [bin(m).count("1") for m in range(1 << 10)]
+MASK_VALUES = [[x for x in range(1, 10) if m >> x & 1] for m in range(1 << 10)]
+
+
+def mask_count(m):
+    """Returns how many numbers the bitmask m holds."""
+    return MASK_COUNT[m] if m < 1024 else bin(m).count("1")
+
+
+def mask_values(m):
+    """Returns the list of the numbers the bitmask m holds, in order."""
+    if m < 1024:
+        return MASK_VALUES[m]
+    values = []
+    while m:
+        b = m & -m  # Lowest bit
+        values.append(b.bit_length() - 1)
+        m ^= b
+    return values
+
+
+def get_masks(grid):
+    """
+    Returns the bitmasks (rows, cols, boxes, elim, layout) of grid: the
+    occupancy of rows, columns and boxes as three lists of N ints, the excluded
+    numbers of each cell as a list of lists (all 0 at first) and the Layout of
+    grid. Returns None if a number appears twice in a row, column or box.
+    """
+    layout = get_layout(len(grid))
+    size, box_index = layout.size, layout.box_index
+    rows, cols, boxes = [0] * size, [0] * size, [0] * size
+    for i in range(size):
+        for j in range(size):
+            x = grid[i][j]
+            if x == 0:
+                continue  # Empty cell
+            b = 1 << x
+            k = box_index[i][j]
+            if (rows[i] | cols[j] | boxes[k]) & b:
+                return None  # Duplicate number
+            rows[i] |= b
+            cols[j] |= b
+            boxes[k] |= b
+    return rows, cols, boxes, [[0] * size for _ in range(size)], layout
+
+
+def copy_masks(masks):
+    """Returns an independent copy of the bitmasks returned by get_masks."""
+    return (masks[0][:], masks[1][:], masks[2][:], [r[:] for r in masks[3]],
+            masks[4])
+
+
+def get_possib(masks, i, j):
+    """Returns the bitmask of the numbers that can go in the cell (i, j)."""
+    rows, cols, boxes, elim, layout = masks
+    return layout.all_mask & ~(rows[i] | cols[j] |
+                               boxes[layout.box_index[i][j]] | elim[i][j])
+
+
+def set_cell(grid, masks, i, j, x):
+    """Writes x in the empty cell (i, j) of grid, updating masks."""
+    b = 1 << x
+    grid[i][j] = x
+    masks[0][i] |= b
+    masks[1][j] |= b
+    masks[2][masks[4].box_index[i][j]] |= b
+
+
+def clear_cell(grid, masks, i, j):
+    """Empties the cell (i, j) of grid, updating masks."""
+    b = ~(1 << grid[i][j])
+    grid[i][j] = 0
+    masks[0][i] &= b
+    masks[1][j] &= b
+    masks[2][masks[4].box_index[i][j]] &= b
+
+
+def eliminate(masks, i, j, bits, trail=None):
+    """
+    Excludes the numbers in bits from the possible values of the cell (i, j),
+    recording the previous exclusions on trail. Returns 1 if a possible value
+    was removed, 0 otherwise.
+    """
+    if get_possib(masks, i, j) & bits == 0:
+        return 0
+    elim = masks[3]
+    if trail is not None:
+        trail.append((i, j, elim[i][j]))
+    elim[i][j] |= bits
+    return 1
+
+
+def undo(grid, masks, trail, mark):
+    """
+    Rolls back the changes recorded on trail after its first mark entries:
+    filled cells (i, j) are emptied and exclusions (i, j, old) are restored.
+    """
+    while len(trail) > mark:
+        change = trail.pop()
+        if len(change) == 2:
+            clear_cell(grid, masks, *change)
+        else:
+            i, j, old = change
+            masks[3][i][j] = old
+
+
+def fill_unique(grid, masks=None, trail=None):
     """
     Fills cells that have only one possibility in-place. Returns number of cells
-    filled. Returns -1 if a cell has no possible value.
+    filled. Returns -1 if a cell has no possible value. If given, masks must
+    match grid and are kept up to date, and the filled cells are appended to
+    trail.
     """
+    if masks is None:
+        masks = get_masks(grid)
+        if masks is None:
+            return -1
     n = 0
-    for i in range(9):
-        for j in range(9):
-            if grid[i][j] != 0:
+    size = len(grid)
+    for i in range(size):
+        row = grid[i]
+        for j in range(size):
+            if row[j] != 0:
                 continue  # Cell content already fixed
-            possib = get_row_missing(grid, i)
-            possib &= get_col_missing(grid, j)
-            possib &= get_box_missing(grid, get_box_index(i, j))
-            if len(possib) == 0:
+            possib = get_possib(masks, i, j)
+            if possib == 0:
                 return -1
-            if len(possib) == 1:
+            if possib & (possib - 1) == 0:  # Only one bit set
                 n += 1
-                grid[i][j] = possib.pop()
+                set_cell(grid, masks, i, j, possib.bit_length() - 1)
+                if trail is not None:
+                    trail.append((i, j))
+    return n
+
+
+def fill_hidden(grid, masks, trail=None):
+    """
+    Fills cells that are the only place for a number in a row, column or box
+    (hidden singles) in-place. Returns number of cells filled. Returns -1 if a
+    number has no possible place in a unit.
+    """
+    n = 0
+    layout = masks[4]
+    for unit in layout.units:
+        once = twice = placed = 0
+        for i, j in unit:
+            if grid[i][j] != 0:
+                placed |= 1 << grid[i][j]
+                continue
+            possib = get_possib(masks, i, j)
+            twice |= once & possib
+            once |= possib
+        if layout.all_mask & ~placed & ~once:
+            return -1  # A missing number has nowhere to go
+        for x in mask_values(once & ~twice):
+            for i, j in unit:
+                if grid[i][j] == 0 and get_possib(masks, i, j) >> x & 1:
+                    n += 1
+                    set_cell(grid, masks, i, j, x)
+                    if trail is not None:
+                        trail.append((i, j))
+                    break
+            else:
+                return -1  # Its cell was taken by another hidden single
+    return n
+
+
+def naked_pairs(grid, masks, trail=None):
+    """
+    Finds two cells of a unit with the same two possible values (naked pair)
+    and excludes those values from the other cells of the unit. Returns number
+    of cells changed.
+    """
+    n = 0
+    for unit in masks[4].units:
+        cells = [(i, j, get_possib(masks, i, j)) for i, j in unit
+                 if grid[i][j] == 0]
+        seen = {}
+        for i, j, possib in cells:
+            if mask_count(possib) != 2:
+                continue
+            if possib not in seen:
+                seen[possib] = (i, j)
+                continue
+            pair = ((i, j), seen[possib])
+            for ci, cj, _ in cells:
+                if (ci, cj) not in pair:
+                    n += eliminate(masks, ci, cj, possib, trail)
+    return n
+
+
+def hidden_pairs(grid, masks, trail=None):
+    """
+    Finds two numbers that can only go in the same two cells of a unit (hidden
+    pair) and excludes every other value from those cells. Returns number of
+    cells changed.
+    """
+    n = 0
+    layout = masks[4]
+    size = layout.size
+    for unit in layout.units:
+        places = [0] * (size + 1)  # Bitmask of the unit positions of each number
+        for pos, (i, j) in enumerate(unit):
+            if grid[i][j] == 0:
+                for x in mask_values(get_possib(masks, i, j)):
+                    places[x] |= 1 << pos
+        twos = [x for x in range(1, size + 1) if mask_count(places[x]) == 2]
+        for a in range(len(twos)):
+            for b in range(a + 1, len(twos)):
+                x, y = twos[a], twos[b]
+                if places[x] != places[y]:
+                    continue
+                keep = (1 << x) | (1 << y)
+                for pos in range(size):
+                    if places[x] >> pos & 1:
+                        i, j = unit[pos]
+                        n += eliminate(masks, i, j, layout.all_mask & ~keep,
+                                       trail)
+    return n
+
+
+def pointing_pairs(grid, masks, trail=None):
+    """
+    Finds numbers that can only go in one row (or column) of a box and excludes
+    them from the rest of that row (or column). Returns number of cells changed.
+    """
+    n = 0
+    layout = masks[4]
+    size, box = layout.size, layout.box
+    for k in range(size):
+        br, bc = divmod(k, box)
+        in_rows, in_cols = [0] * (size + 1), [0] * (size + 1)
+        for i, j in layout.units[2 * size + k]:
+            if grid[i][j] == 0:
+                for x in mask_values(get_possib(masks, i, j)):
+                    in_rows[x] |= 1 << i
+                    in_cols[x] |= 1 << j
+        for x in range(1, size + 1):
+            r, c = in_rows[x], in_cols[x]
+            if r != 0 and r & (r - 1) == 0:  # Only one row
+                i = r.bit_length() - 1
+                for j in range(size):
+                    if j // box != bc and grid[i][j] == 0:
+                        n += eliminate(masks, i, j, 1 << x, trail)
+            if c != 0 and c & (c - 1) == 0:  # Only one column
+                j = c.bit_length() - 1
+                for i in range(size):
+                    if i // box != br and grid[i][j] == 0:
+                        n += eliminate(masks, i, j, 1 << x, trail)
     return n
 
 
-def get_status(grid):
+# Available propagation steps, by name, from the cheapest to the most expensive
+PROPAGATORS = {"naked": fill_unique, "hidden": fill_hidden,
+               "naked_pairs": naked_pairs, "hidden_pairs": hidden_pairs,
+               "pointing": pointing_pairs}
+DEFAULT_PROPAGATION = (fill_unique, fill_hidden)
+
+
+def propagate(grid, masks, trail=None, propagation=DEFAULT_PROPAGATION):
+    """
+    Runs the steps of propagation (functions like fill_unique) on grid until
+    none of them changes anything, going back to the first step after every
+    change. Returns the number of changes, -1 if a step found a contradiction.
+    """
+    total = 0
+    k = 0
+    while k < len(propagation):
+        n = propagation[k](grid, masks, trail)
+        if n == -1:
+            return -1
+        if n == 0:
+            k += 1
+        else:
+            total += n
+            k = 0
+    return total
+
+
+def choose_cell(grid, masks):
+    """
+    Returns (i, j, possib) for the empty cell of grid with the fewest possible
+    values (possib being their bitmask), None if grid is full.
+    """
+    size = len(grid)
+    best, count = None, size + 1
+    for i in range(size):
+        row = grid[i]
+        for j in range(size):
+            if row[j] != 0:
+                continue  # Cell content already fixed
+            possib = get_possib(masks, i, j)
+            if mask_count(possib) < count:
+                best, count = (i, j, possib), mask_count(possib)
+                if count <= 1:
+                    return best  # Cannot do better than this
+    return best
+
+
+def get_status(grid, masks=None):
     """
     Returns 0 if the grid is yet to be solved, 1 if the grid is solved and -1 if
-    the grid is not solvable (i.e. contains errors).
+    the grid is not solvable (i.e. contains errors). If masks are given they are
+    assumed to be consistent (as built by get_masks) and only they are checked.
     """
+    if masks is not None:
+        all_mask = masks[4].all_mask
+        return 1 if all(m == all_mask for m in masks[0]) else 0
+    size = len(grid)
     res = 1
-    for i in range(9):  # Check rows
-        rowstat = [0] * 10
-        for j in range(9):
+    for i in range(size):  # Check rows
+        rowstat = [0] * (size + 1)
+        for j in range(size):
             rowstat[grid[i][j]] += 1
         if any(n > 1 for n in rowstat[1:]):
             return -1  # Error(s)
         if rowstat[0] > 0:
             res = 0  # Empty cells
-    for j in range(9):  # Check cols
-        colstat = [0] * 10
-        for i in range(9):
+    for j in range(size):  # Check cols
+        colstat = [0] * (size + 1)
+        for i in range(size):
             colstat[grid[i][j]] += 1
         if any(n > 1 for n in colstat[1:]):
             return -1  # Error(s)
         if colstat[0] > 0:
             res = 0  # Empty cells
-    for k in range(9):  # Check boxes
-        boxstat = [0] * 10
+    for k in range(size):  # Check boxes
+        boxstat = [0] * (size + 1)
         for x in box_iter(grid, k):
             boxstat[x] += 1
         if any(n > 1 for n in boxstat[1:]):
@@ -123,20 +568,17 @@ def get_status(grid):
     return res
 
 
-def brute_force(grid):
-    """Find a cell with multiple possible values and try them all."""
-    # When brute_force is called, grid has no empty cell with len(possib) <= 1
-    for i in range(9):
-        for j in range(9):
-            if grid[i][j] != 0:
-                continue  # Cell content already fixed
-            possib = get_row_missing(grid, i)
-            possib &= get_col_missing(grid, j)
-            possib &= get_box_missing(grid, get_box_index(i, j))
-            for p in possib:
-                grid[i][j] = p  # No need to preserve grid at this point
-                yield from recursive_solve(grid)
-            return  # Only test one cell, recursive_solve will do the rest
+def brute_force(grid, masks, propagation=DEFAULT_PROPAGATION, stats=None,
+                count_only=False):
+    """Find the cell with the fewest possible values and try them all."""
+    # When brute_force is called, grid has at least one empty cell
+    i, j, possib = choose_cell(grid, masks)
+    for p in mask_values(possib):
+        set_cell(grid, masks, i, j, p)
+        yield from recursive_solve(grid, masks, propagation, stats,
+                                   count_only)
+        clear_cell(grid, masks, i, j)
+    # Only test one cell, recursive_solve will do the rest
 
 
 def dict_increment(d, i):
@@ -150,74 +592,723 @@ def safe_dict_get(d, i):
     return d[i] if i in d else 0
 
 
-recursive_calls = 0
-recursive_level = 0
-level_calls = {}
-level_sols = {}
-def recursive_solve(grid):
-    """Yields all solutions for a certain grid."""
+class SolveStats:
+    """
+    Recursion tracing of a single solve: total recursive calls, current
+    recursion level and recursive calls and solutions found per level (as dicts
+    level: count). Each solve needs its own instance.
+    """
+
+    def __init__(self):
+        self.recursive_calls = 0
+        self.recursive_level = 0
+        self.level_calls = {}
+        self.level_sols = {}
+
+    def call(self):
+        """Records a recursive call at the current level."""
+        self.recursive_calls += 1
+        dict_increment(self.level_calls, self.recursive_level)
+
+    def solution(self):
+        """Records a solution found at the current level."""
+        dict_increment(self.level_sols, self.recursive_level)
+
+    def merge(self, other, offset=0):
+        """
+        Adds the counts of other, e.g. those of a subgrid solved separately,
+        with its levels shifted down by offset.
+        """
+        self.recursive_calls += other.recursive_calls
+        for l, n in other.level_calls.items():
+            self.level_calls[l + offset] = safe_dict_get(self.level_calls,
+                                                         l + offset) + n
+        for l, n in other.level_sols.items():
+            self.level_sols[l + offset] = safe_dict_get(self.level_sols,
+                                                        l + offset) + n
+
+    def histogram(self):
+        """Returns a list of (level, calls, solutions) for each level reached."""
+        if not self.level_calls:
+            return []
+        return [(l, safe_dict_get(self.level_calls, l),
+                 safe_dict_get(self.level_sols, l))
+                for l in range(max(self.level_calls) + 1)]
+
+
+def recursive_solve(grid, masks=None, propagation=DEFAULT_PROPAGATION,
+                    stats=None, count_only=False):
+    """
+    Yields all solutions for a certain grid. masks, if given, must match grid
+    (they save a full scan of the grid). propagation is the sequence of steps
+    run before brute force (see propagate). The recursion is traced on stats if
+    given (see SolveStats). If count_only is True, None is yielded in place of
+    each solution.
+    """
     # Recursion tracing
-    global recursive_calls, level_calls, level_sols, recursive_level
-    recursive_calls += 1
-    dict_increment(level_calls, recursive_level)
+    if stats is None:
+        stats = SolveStats()
+    stats.call()
     # Avoid modifying the original
-    grid = deepcopy(grid)
-    # First fill all the cells that have only one possible number
-    while True:
-        n = fill_unique(grid)
-        if n == 0:
-            break
-        if n == -1:
-            return  # One cell has no possible number, no solution here
+    grid = grid_copy(grid)
+    masks = get_masks(grid) if masks is None else copy_masks(masks)
+    if masks is None:
+        return  # Grid has duplicate numbers, no solution here
+    # First fill all the cells that can be deduced
+    if propagate(grid, masks, None, propagation) == -1:
+        return  # One cell has no possible number, no solution here
     # Check if the grid is solved
-    s = get_status(grid)
+    s = get_status(grid, masks)
     if s == -1:
         return  # Grid has errors, no solution here
     if s == 1:
-        dict_increment(level_sols, recursive_level)
-        yield grid  # Grid is solved
+        stats.solution()
+        yield None if count_only else grid  # Grid is solved
         return  # Done here
     # If the grid is still not solved go with bruteforce algorithm
-    recursive_level += 1
-    yield from brute_force(grid)
-    recursive_level -= 1
-
-
-# Prompt the user to enter a sudoku to be solved
-print("Enter the sudoku grid to be solved as 9 lines of 9 numbers. An empty")
-print('box can be entered as either a "0" (zero) or a " " (space). Do not use')
-print("any character to split 3x3 boxes, rows or columns.")
-while True:
-    print()
-    grid = sudoku_input()
-    print()
-    if grid is not None:
-        break
-    print("Please enter something like the part on the left (the part on the")
-    print("right is a more readable representation):")
-    print("   3 5                        |3 5|   ")
-    print("  98 23                      9|8 2|3  ")
-    print(" 5     9                    5 |   | 9 ")
-    print("82     31                  ---+---+---")
-    print("                 =>        82 |   | 31")
-    print("46     87                     |   |   ")
-    print(" 8     6                   46 | 1 | 87")
-    print("  32 15                    ---+---+---")
-    print("   7 4                      8 |   | 6 ")
-    print("                             3|2 1|5  ")
-    print("                              |724|   ")
-
-
-print("Solving...")
-n = 0
-for sol in recursive_solve(grid):
-    n += 1
-    print()
-    sudoku_print(sol)
-print()
-print("{} solutions found.".format(n))
-print("{} total recursive calls.".format(recursive_calls))
-print("Level   Calls   Solutions")
-for l in range(max(level_calls) + 1):
-    print("{:^5d} {:^9d} {:^9d}".format(l, safe_dict_get(level_calls, l),
-                                        safe_dict_get(level_sols, l)))
+    stats.recursive_level += 1
+    yield from brute_force(grid, masks, propagation, stats, count_only)
+    stats.recursive_level -= 1
+
+
+def trail_brute_force(grid, masks, trail, propagation=DEFAULT_PROPAGATION,
+                      stats=None):
+    """Like brute_force, but on the shared grid of trail_search."""
+    i, j, possib = choose_cell(grid, masks)
+    for p in mask_values(possib):
+        set_cell(grid, masks, i, j, p)
+        trail.append((i, j))
+        yield from trail_search(grid, masks, trail, propagation, stats)
+        undo(grid, masks, trail, len(trail) - 1)
+    # Only test one cell, trail_search will do the rest
+
+
+def trail_search(grid, masks, trail, propagation=DEFAULT_PROPAGATION,
+                 stats=None):
+    """
+    Yields all solutions for a certain grid, working in-place on grid and masks.
+    Every assignment is recorded on trail and rolled back on backtrack, so grid
+    and masks are restored when the generator ends (or is closed). The yielded
+    grid is grid itself, copy it to keep it.
+    """
+    # Recursion tracing
+    if stats is None:
+        stats = SolveStats()
+    stats.call()
+    mark = len(trail)
+    try:
+        # First fill all the cells that can be deduced
+        if propagate(grid, masks, trail, propagation) == -1:
+            return  # One cell has no possible number, no solution here
+        # Check if the grid is solved
+        if get_status(grid, masks) == 1:
+            stats.solution()
+            yield grid  # Grid is solved
+            return  # Done here
+        # If the grid is still not solved go with bruteforce algorithm
+        stats.recursive_level += 1
+        yield from trail_brute_force(grid, masks, trail, propagation, stats)
+        stats.recursive_level -= 1
+    finally:
+        undo(grid, masks, trail, mark)
+
+
+def trail_solve(grid, propagation=DEFAULT_PROPAGATION, stats=None,
+                count_only=False):
+    """
+    Yields all solutions for a certain grid, like recursive_solve but without
+    copying the grid at every recursion level (see trail_search). If count_only
+    is True, None is yielded in place of each solution, so no grid is copied.
+    """
+    grid = grid_copy(grid)  # Avoid modifying the original
+    masks = get_masks(grid)
+    if masks is None:
+        return  # Grid has duplicate numbers, no solution here
+    for sol in trail_search(grid, masks, [], propagation, stats):
+        yield None if count_only else [row[:] for row in sol]
+
+
+def trail_split(grid, masks, trail, depth, propagation=DEFAULT_PROPAGATION,
+                stats=None):
+    """
+    Like trail_search, but stops at depth levels of recursion: yields (grid,
+    True) for the solutions found above that level and (grid, False) for each
+    of the grids reached at that level, which are left unsolved (and are not
+    traced on stats, solving them makes their first call at level depth).
+    """
+    if stats is None:
+        stats = SolveStats()
+    if stats.recursive_level == depth:
+        yield grid, False
+        return
+    stats.call()
+    mark = len(trail)
+    try:
+        if propagate(grid, masks, trail, propagation) == -1:
+            return  # One cell has no possible number, no solution here
+        if get_status(grid, masks) == 1:
+            stats.solution()
+            yield grid, True
+            return
+        stats.recursive_level += 1
+        i, j, possib = choose_cell(grid, masks)
+        for p in mask_values(possib):
+            set_cell(grid, masks, i, j, p)
+            trail.append((i, j))
+            yield from trail_split(grid, masks, trail, depth, propagation,
+                                   stats)
+            undo(grid, masks, trail, len(trail) - 1)
+        stats.recursive_level -= 1
+    finally:
+        undo(grid, masks, trail, mark)
+
+
+class SearchState:
+    """
+    Reusable search state of a grid: a private copy of the grid, its bitmasks
+    and an undo trail, kept consistent while cells are set and cleared, so that
+    repeated searches on slightly different grids (e.g. while removing clues)
+    need no setup. Searches leave the state as they found it.
+    """
+
+    def __init__(self, grid, propagation=DEFAULT_PROPAGATION):
+        self.grid = grid_copy(grid)
+        self.masks = get_masks(self.grid)
+        if self.masks is None:
+            raise ValueError("Duplicate numbers!")
+        self.trail = []
+        self.propagation = propagation
+
+    def set(self, i, j, x):
+        """Writes x in the empty cell (i, j), which must be possible."""
+        set_cell(self.grid, self.masks, i, j, x)
+
+    def clear(self, i, j):
+        """Empties the cell (i, j)."""
+        clear_cell(self.grid, self.masks, i, j)
+
+    def count(self, limit=None, stats=None):
+        """Returns the number of solutions, counting at most limit of them."""
+        n = 0
+        search = trail_search(self.grid, self.masks, self.trail,
+                              self.propagation, stats)
+        try:
+            for _ in search:
+                n += 1
+                if n == limit:
+                    break
+        finally:
+            search.close()  # Rolls back the search
+        return n
+
+    def has_other_solution(self, i, j, x, stats=None):
+        """
+        Returns True if there is a solution with a number other than x in the
+        empty cell (i, j). If the grid with x in (i, j) has a unique solution,
+        this tells whether emptying (i, j) keeps the solution unique at the
+        cost of a single search.
+        """
+        mark = len(self.trail)
+        eliminate(self.masks, i, j, 1 << x, self.trail)
+        try:
+            return self.count(1, stats) > 0
+        finally:
+            undo(self.grid, self.masks, self.trail, mark)
+
+    def solved_by(self, propagation):
+        """Returns True if propagation alone solves the grid."""
+        mark = len(self.trail)
+        try:
+            return (propagate(self.grid, self.masks, self.trail,
+                              propagation) != -1 and
+                    get_status(self.grid, self.masks) == 1)
+        finally:
+            undo(self.grid, self.masks, self.trail, mark)
+
+
+# Exact-cover (Dancing Links) engine: each of the N^3 candidates "number x in
+# cell (i, j)" is a row covering 4 of the 4 * N^2 constraints (cell filled, x in
+# row i, x in column j, x in box k), i.e. 729 rows and 324 columns for a 9x9
+# grid. The sparse matrix is stored as circular doubly linked lists in flat int
+# arrays: node 0 is the root, the next 4 * N^2 nodes are the column headers and
+# the following ones are the 1s of the matrix.
+_dlx_templates = {}
+
+
+def dlx_candidate_columns(i, j, x, layout):
+    """Returns the 4 constraint columns satisfied by number x in cell (i, j)."""
+    size = layout.size
+    cells = size * size
+    return (size * i + j, cells + size * i + x - 1,
+            2 * cells + size * j + x - 1,
+            3 * cells + size * layout.box_index[i][j] + x - 1)
+
+
+def dlx_build(size=9):
+    """
+    Builds the (L, R, U, D, C, ROW, S) arrays of the full exact-cover matrix of
+    size x size grids: left/right/up/down links, column header and candidate of
+    each node and size of each column. Candidate r means number r % size + 1 in
+    cell divmod(r // size, size).
+    """
+    layout = get_layout(size)
+    columns = 4 * size * size
+    n = columns + 1
+    L = [x - 1 for x in range(n)]
+    L[0] = columns
+    R = [x + 1 for x in range(n)]
+    R[columns] = 0
+    U = list(range(n))
+    D = list(range(n))
+    C = list(range(n))
+    ROW = [-1] * n
+    S = [0] * n
+    for r in range(size ** 3):
+        c, x = divmod(r, size)
+        first = len(L)
+        for col in dlx_candidate_columns(c // size, c % size, x + 1, layout):
+            node = len(L)
+            col += 1  # Header node of the column
+            L.append(node - 1)
+            R.append(node + 1)
+            U.append(U[col])
+            D.append(col)
+            D[U[col]] = node
+            U[col] = node
+            C.append(col)
+            ROW.append(r)
+            S[col] += 1
+        L[first] = len(L) - 1
+        R[-1] = first
+    return L, R, U, D, C, ROW, S
+
+
+def dlx_solve(grid, propagation=None, stats=None, count_only=False):
+    """
+    Yields all solutions for a certain grid using Dancing Links, tracing the
+    recursion on stats if given. propagation is ignored (covering constraints
+    already propagates them). If count_only is True, None is yielded in place
+    of each solution, so no grid is built.
+    """
+    if stats is None:
+        stats = SolveStats()
+    if not isinstance(grid, list):
+        grid = grid_copy(grid)
+    layout = get_layout(len(grid))
+    size = layout.size
+    if size not in _dlx_templates:
+        _dlx_templates[size] = dlx_build(size)
+    L, R, U, D, C, ROW, S = _dlx_templates[size]
+    # Only the links and sizes change while solving
+    L, R, U, D, S = L[:], R[:], U[:], D[:], S[:]
+
+    def cover(c):
+        R[L[c]] = R[c]
+        L[R[c]] = L[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(c):
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        R[L[c]] = c
+        L[R[c]] = c
+
+    def search():
+        stats.call()
+        if R[0] == 0:
+            stats.solution()
+            if count_only:
+                yield None
+                return
+            sol = deepcopy(grid)
+            for r in chosen:
+                c, x = divmod(r, size)
+                sol[c // size][c % size] = x + 1
+            yield sol
+            return
+        # Branch on the constraint with the fewest candidates
+        c, count, col = 0, size + 1, R[0]
+        while col != 0:
+            if S[col] < count:
+                c, count = col, S[col]
+                if count <= 1:
+                    break
+            col = R[col]
+        if count == 0:
+            return  # A constraint cannot be satisfied, no solution here
+        cover(c)
+        stats.recursive_level += 1
+        r = D[c]
+        while r != c:
+            chosen.append(ROW[r])
+            j = R[r]
+            while j != r:
+                cover(C[j])
+                j = R[j]
+            yield from search()
+            j = L[r]
+            while j != r:
+                uncover(C[j])
+                j = L[j]
+            chosen.pop()
+            r = D[r]
+        stats.recursive_level -= 1
+        uncover(c)
+
+    # Clues are removed from the matrix before searching
+    covered = bytearray(len(S))
+    for i in range(size):
+        for j in range(size):
+            x = grid[i][j]
+            if x == 0:
+                continue  # Empty cell
+            for col in dlx_candidate_columns(i, j, x, layout):
+                if covered[col + 1]:
+                    return  # Grid has duplicate numbers, no solution here
+                covered[col + 1] = 1
+                cover(col + 1)
+    chosen = []
+    yield from search()
+
+
+# Available solving engines, by name
+ENGINES = {"recursive": recursive_solve, "trail": trail_solve,
+           "dlx": dlx_solve}
+
+
+# Parallel search of a single grid: engine, propagation and count_only of the
+# pool workers
+_split_config = ("trail", DEFAULT_PROPAGATION, False)
+
+
+def split_init(engine, propagation, count_only=False):
+    """Initializes a parallel search worker process."""
+    global _split_config
+    _split_config = engine, propagation, count_only
+
+
+def split_subgrid(grid):
+    """
+    Solves a subgrid of a parallel search. Returns (sols, stats), sols being the
+    list of solutions (their number if count_only) and stats the SolveStats of
+    the search.
+    """
+    engine, propagation, count_only = _split_config
+    stats = SolveStats()
+    sols = ENGINES[engine](grid, propagation=propagation, stats=stats,
+                           count_only=count_only)
+    sols = sum(1 for _ in sols) if count_only else list(sols)
+    return sols, stats
+
+
+def split_solve(grid, depth=4, engine="trail",
+                propagation=DEFAULT_PROPAGATION, stats=None, count_only=False,
+                processes=None):
+    """
+    Yields all solutions for a certain grid, like the engines, but in parallel:
+    the search tree is explored up to depth levels (see trail_split) and the
+    subgrids reached at that level are solved by the given engine in a pool of
+    processes. Subgrids are handed out one at a time, so idle workers take the
+    next one as soon as they finish. The recursion statistics of the subgrids
+    are merged on stats. Solutions come in no particular order.
+    """
+    if stats is None:
+        stats = SolveStats()
+    grid = grid_copy(grid)  # Avoid modifying the original
+    masks = get_masks(grid)
+    if masks is None:
+        return  # Grid has duplicate numbers, no solution here
+    subgrids = []
+    for sub, solved in trail_split(grid, masks, [], depth, propagation, stats):
+        if solved:
+            yield None if count_only else [row[:] for row in sub]
+        else:
+            subgrids.append([row[:] for row in sub])
+    if not subgrids:
+        return
+    processes = min(processes or os.cpu_count() or 1, len(subgrids))
+    with multiprocessing.Pool(processes, split_init,
+                              (engine, propagation, count_only)) as pool:
+        for sols, sub_stats in pool.imap_unordered(split_subgrid, subgrids):
+            stats.merge(sub_stats, depth)
+            if count_only:
+                yield from repeat(None, sols)
+            else:
+                yield from sols
+
+
+def solve(grid, limit=None, engine="recursive",
+          propagation=DEFAULT_PROPAGATION, stats=None, count_only=False,
+          split=None, processes=None):
+    """
+    Returns an iterator over the solutions of grid (at most limit of them if
+    limit is not None, the search stops as soon as the limit is reached), found
+    by the engine with the given name using the given propagation steps (see
+    propagate). Pass a new SolveStats as stats to get the recursion statistics
+    of this call. If count_only is True the iterator gives None in place of
+    each solution. If split is not None, the search is split at that depth in
+    a pool of processes (see split_solve). grid, a list of lists or a compact
+    grid (see grid_copy), is not modified.
+    """
+    if engine not in ENGINES:
+        raise ValueError("Unknown engine {!r}!".format(engine))
+    if split is not None:
+        sols = split_solve(grid, split, engine, propagation, stats, count_only,
+                           processes)
+    else:
+        sols = ENGINES[engine](grid, propagation=propagation, stats=stats,
+                               count_only=count_only)
+    return sols if limit is None else islice(sols, limit)
+
+
+def count_solutions(grid, limit=None, engine="trail",
+                    propagation=DEFAULT_PROPAGATION, stats=None, split=None,
+                    processes=None):
+    """
+    Returns the number of solutions of grid, counting at most limit of them if
+    limit is not None. No solution grid is built (see solve for the other
+    arguments, the default engine is the cheapest for counting).
+    """
+    return sum(1 for _ in solve(grid, limit, engine, propagation, stats, True,
+                                split, processes))
+
+
+def is_unique(grid, engine="trail", propagation=DEFAULT_PROPAGATION,
+              stats=None, split=None, processes=None):
+    """
+    Returns True if grid has exactly one solution. The search stops as soon as
+    a second solution is found.
+    """
+    return count_solutions(grid, 2, engine, propagation, stats, split,
+                           processes) == 1
+
+
+# Batch results of the "unique" mode, by number of solutions (up to 2)
+UNIQUE_RESULTS = ("none", "unique", "multiple")
+
+
+# Batch solving: engine, propagation, mode and limit of the pool workers
+_batch_config = ("recursive", DEFAULT_PROPAGATION, "solve", None)
+
+
+def batch_init(engine, propagation, mode="solve", limit=None):
+    """Initializes a batch worker process."""
+    global _batch_config
+    _batch_config = engine, propagation, mode, limit
+
+
+def batch_chunk(lines):
+    """
+    Solves a list of one-line puzzles. Returns lines and the list of their
+    results (see batch_solve), None for invalid puzzles.
+    """
+    engine, propagation, mode, limit = _batch_config
+    results = []
+    for line in lines:
+        try:
+            grid = line_to_grid(line)
+        except ValueError:
+            results.append(None)
+            continue
+        if mode == "count":
+            results.append(str(count_solutions(grid, limit, engine,
+                                               propagation)))
+        elif mode == "unique":
+            results.append(UNIQUE_RESULTS[count_solutions(grid, 2, engine,
+                                                          propagation)])
+        else:
+            sol = next(solve(grid, 1, engine, propagation), None)
+            results.append(None if sol is None else grid_to_line(sol))
+    return lines, results
+
+
+def batch_solve(lines, engine="recursive", propagation=DEFAULT_PROPAGATION,
+                processes=None, chunksize=64, ordered=True, mode="solve",
+                limit=None):
+    """
+    Yields (puzzle, result) for each one-line puzzle of the iterable lines
+    (blank lines and lines starting with "#" are skipped), solving chunks of
+    chunksize puzzles in a pool of processes. result depends on mode: "solve"
+    gives the first solution in the one-line format (None if unsolvable),
+    "count" the number of solutions (up to limit if not None) and "unique" one
+    of UNIQUE_RESULTS. result is None for invalid puzzles.
+    Results come in input order, or as soon as they are ready if ordered is
+    False. Only two chunks per process are read ahead, so memory use does not
+    depend on the number of puzzles.
+    """
+    processes = processes or os.cpu_count() or 1
+    lines = (line.strip() for line in lines)
+    lines = (line for line in lines if line and not line.startswith("#"))
+    chunks = iter(lambda: list(islice(lines, chunksize)), [])
+    pending = deque()  # Submitted chunks, in input order
+    ready = queue.Queue()  # Chunk results, in completion order
+
+    def next_result():
+        if ordered:
+            return pending.popleft().get()
+        pending.popleft()
+        res = ready.get()
+        if isinstance(res, BaseException):
+            raise res
+        return res
+
+    with multiprocessing.Pool(processes, batch_init,
+                              (engine, propagation, mode, limit)) as pool:
+        for chunk in chunks:
+            if ordered:
+                pending.append(pool.apply_async(batch_chunk, (chunk,)))
+            else:
+                pending.append(pool.apply_async(batch_chunk, (chunk,),
+                                                callback=ready.put,
+                                                error_callback=ready.put))
+            if len(pending) >= 2 * processes:
+                yield from zip(*next_result())
+        while pending:
+            yield from zip(*next_result())
+
+
+def propagation_arg(s):
+    """Converts a comma-separated list of PROPAGATORS names to a sequence."""
+    try:
+        return tuple(PROPAGATORS[name] for name in s.split(",") if name)
+    except KeyError as e:
+        raise argparse.ArgumentTypeError("unknown propagation step {}"
+                                         .format(e))
+
+
+def main(argv=None):
+    """Command line interface (see --help)."""
+    parser = argparse.ArgumentParser(description="Solve a sudoku grid entered "
+                                     "on the standard input, or a batch of "
+                                     "grids.")
+    parser.add_argument("-e", "--engine", choices=list(ENGINES),
+                        default="recursive", help="solving engine (default: "
+                        "%(default)s, trail avoids copying the grid, dlx is "
+                        "more predictable on hard grids)")
+    parser.add_argument("-p", "--propagate", type=propagation_arg,
+                        default=DEFAULT_PROPAGATION, metavar="STEPS",
+                        help="comma-separated propagation steps run before "
+                        "branching, among {} (default: naked,hidden)"
+                        .format(",".join(PROPAGATORS)))
+    parser.add_argument("-m", "--max-solutions", type=int, default=None,
+                        metavar="N", help="stop after N solutions (default: "
+                        "find all of them)")
+    parser.add_argument("-c", "--count", action="store_true",
+                        help="only count the solutions, without printing them")
+    parser.add_argument("-u", "--unique", action="store_true",
+                        help="only check whether the solution is unique, "
+                        "stopping at the second one")
+    parser.add_argument("-s", "--size", type=int, default=9,
+                        help="number of rows of the grid entered on the "
+                        "standard input, a square (default: %(default)s)")
+    parser.add_argument("-b", "--batch", metavar="FILE",
+                        help="solve the one-line puzzles (81 chars, 0 or . "
+                        "for empty cells, or any N*N cells) in FILE, - for the "
+                        "standard input, printing each puzzle with its first "
+                        "solution (or its result with --count or --unique)")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="worker processes for --batch or --split "
+                        "(default: one per CPU)")
+    parser.add_argument("--split", type=int, default=None, metavar="DEPTH",
+                        help="search the grid entered on the standard input "
+                        "in parallel, splitting its search tree at DEPTH "
+                        "levels")
+    parser.add_argument("--chunksize", type=int, default=64,
+                        help="puzzles sent to a worker at a time with --batch "
+                        "(default: %(default)s)")
+    parser.add_argument("--unordered", action="store_true",
+                        help="print --batch results as soon as they are "
+                        "ready instead of in input order")
+    args = parser.parse_args(argv)
+    mode = "unique" if args.unique else "count" if args.count else "solve"
+    try:
+        get_layout(args.size)
+    except ValueError:
+        parser.error("argument -s/--size: not a square")
+
+    if args.batch is not None:
+        ifs = sys.stdin if args.batch == "-" else open(args.batch)
+        with ifs:
+            for puzzle, res in batch_solve(ifs, args.engine, args.propagate,
+                                           args.jobs, args.chunksize,
+                                           not args.unordered, mode,
+                                           args.max_solutions):
+                print(puzzle, res or "-")
+        return
+
+    # Prompt the user to enter a sudoku to be solved
+    print("Enter the sudoku grid to be solved as {0} lines of {0} numbers. An "
+          "empty".format(args.size))
+    print('box can be entered as either a "0" (zero) or a " " (space). Do '
+          "not use")
+    print("any character to split boxes, rows or columns.")
+    if args.size > 9:
+        print("Numbers above 9 are entered as letters (A is 10, B is 11, etc.),")
+        print("or the whole row is entered as numbers separated by spaces.")
+    while True:
+        print()
+        grid = sudoku_input(args.size)
+        print()
+        if grid is not None:
+            break
+        print("Please enter something like the part on the left (the part on "
+              "the")
+        print("right is a more readable representation):")
+        print("   3 5                        |3 5|   ")
+        print("  98 23                      9|8 2|3  ")
+        print(" 5     9                    5 |   | 9 ")
+        print("82     31                  ---+---+---")
+        print("                 =>        82 |   | 31")
+        print("46     87                     |   |   ")
+        print(" 8     6                   46 | 1 | 87")
+        print("  32 15                    ---+---+---")
+        print("   7 4                      8 |   | 6 ")
+        print("                             3|2 1|5  ")
+        print("                              |724|   ")
+
+    print("Solving...")
+    stats = SolveStats()
+    if mode == "unique":
+        n = count_solutions(grid, 2, args.engine, args.propagate, stats,
+                            args.split, args.jobs)
+        print()
+        print({0: "The grid has no solution.",
+               1: "The solution is unique.",
+               2: "The grid has more than one solution."}[n])
+    elif mode == "count":
+        n = count_solutions(grid, args.max_solutions, args.engine,
+                            args.propagate, stats, args.split, args.jobs)
+        print()
+        print("{} solutions found.".format(n))
+    else:
+        n = 0
+        for sol in solve(grid, args.max_solutions, args.engine, args.propagate,
+                         stats, False, args.split, args.jobs):
+            n += 1
+            print()
+            sudoku_print(sol)
+        print()
+        print("{} solutions found.".format(n))
+    print("{} total recursive calls.".format(stats.recursive_calls))
+    print("Level   Calls   Solutions")
+    for l, calls, sols in stats.histogram():
+        print("{:^5d} {:^9d} {:^9d}".format(l, calls, sols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# Benchmark of the sudoku solver engines on built-in sets of puzzles, with
+# machine-readable results that can be compared between two runs.
+import argparse
+import json
+import platform
+import sys
+import time
+from math import ceil
+
+from sudokusolver import (DEFAULT_PROPAGATION, ENGINES, PROPAGATORS,
+                          SolveStats, line_to_grid, propagation_arg, solve)
+
+# Built-in puzzle sets, in the one-line format
+EASY = [  # Solved by naked singles alone
+    "29..17...87.2.4...1..3....2..51.8.973...5...47419.3..5..76....951.4..2.3...8.....",
+    ".6..9.4....4....8.857....3.489..375..1......363...41.9.9..85..73417.....5.8.6...4",
+    ".5.9.743.82..1...........1.4.8.6.3..3628.5..15..73.6.....4791....63.8.5...7.5...4",
+    "2..9..3.7.73..8.19..8..7...3.6..4..582....13.5....327.7..31.....32.769.19...5....",
+    ".3259..68.....63...56.1.9271.....65.678.5341.........9.9..4.2.6..7...5.....237...",
+    "57..1.8.3.4..7..2..28.3.74.......67..374....8481....5.......2.72..8...9.795.6.4.1",
+    "....25...21..7.56..74......4.7.198....8..26.31..58.9......6.7987.135..4.82..9....",
+    "98..4..7..5..3.816..7.25....14..3.6....4..12.....729.45....639....7..6.1.71.8...2",
+    ".8......52.4.5.9.3..7.41...7.5.638.9..8.72.6..1..8....4....65385.64.8......7..4.6",
+    "3..8.692..593127....27.541.9.4.31.8.......6..71.......54.96.1...932.....8.6......",
+    ".74932..5.9..5..14.5.4...7.......73..2..8....91327.....8.31..4.....27...73.8.5.29",
+    "8.4...12..3..42...7..9...4..75.84269....6.7..9.6...8.5...176.8.....3.6.....498.51",
+    "4.3..6.219.7....6..8.57.934....4...5...985.73......41......834..7.21..568.63.....",
+    "...8..2.4.4..31.....19..6372....3.89.74.8.5.39..51.74..692.83....7....9......7..2",
+    ".9.2.743.....5......4.3.29.4.562.98..79.4....2.87.31...4..6.5.9..2.....6..6..537.",
+    "....1....15..7.23.2..9.3..1.47..98.....76..5.531.8..7646.........5.281.3.13...4.5",
+    "73..4.6924...59.8.....6...7684.75....7......5.51..6....4.68...9..79241..1...3.2..",
+    ".......614.69.2.53...3.58...6.5.3.47.79..4.86..............8.3....6.942594..316.8",
+    "..13.2.8.92...5.......9..2.1637.9.....4..617525..1.9..5....7..43....461.416...2..",
+    "...6.5.48..3...1.6..4.3...735...94.1.7.2...39..6.4..8.8.1.56....37..2..56.5...8.3",
+]
+HARD = [  # Need deep searches with simple propagation
+    "85...24..72......9..4.........1.7..23.5...9...4...........8..7..17..........36.4.",
+    "..53.....8......2..7..1.5..4....53...1..7...6..32...8..6.5....9..4....3......97..",
+    "1....7.9..3..2...8..96..5....53..9...1..8...26....4...3......1..4......7..7...3..",
+    "8..........36......7..9.2...5...7.......457.....1...3...1....68..85...1..9....4..",
+    "12.3....435....1....4........54..2..6...7.........8.9...31..5.......9.7.....6...8",
+    "1.....7.9.4...72..8.........7..1..6.3.......5.6..4..2.........8..53...7.7.2....46",
+    "..3..6.8....1..2......7...4..9..8.6..3..4...1.7.2.....3....5.....5...6..98.....5.",
+    "4.....3.....8.2......7........1...8734.......6........5...6........1.4...82......",
+    "6.2.5.........3.4..........43...8....1....2........7..5..27...........81...6.....",
+    "....14....3....2...7..........9...3.6.1.............8.2.....1.4....5.6.....7.8...",
+]
+SEVENTEEN = [  # Minimal number of clues for a unique solution
+    ".......1.4.........2...........5.4.7..8...3....1.9....3..4..2...5.1........8.6...",
+    ".......12....35......6...7.7.....3.....4..8..1...........12.....8.....4..5....6..",
+    ".......12..36..........7...41..2.......5..3..7.....6..28.....4....3..5...........",
+    ".......12..8.3...........4.12.5..........47...6.......5.7...3.....62.......1.....",
+    ".......13....3..8..7..........2.6....3....9......1....6..5..2.4...4..7..1........",
+    ".......13...2............8....76.2....8...4...1.......2.....75.6..34.........8...",
+    ".......13...5...7....8.2......4..9..1.7............2..89.....5..4....6......1....",
+    ".......13...7...6....5.8......4..8..1.6............2..74.....5..2....4......1....",
+    ".......14......2.38...5.......2.7....31............65.6.....7.....14.......3.....",
+    ".......14....2....5.........1.8.4...7.....5.....1.........5.73...42......3....6..",
+    ".......14...7.8............1.4..5......2..83.6........5...4.....3....7......9...1",
+    "4.....8.5.3..........7......2.....6.....8.4......1.......6.3.7.5..2.....1.4......",
+    "52...6.........7.13...........4..8..6......5...........418.........3..2...87.....",
+    "6.....8.3.4.7.................5.4.7.3..2.....1.6.......2.....5.....8.6......1....",
+    "48.3............71.2.......7.5....6....2..8.............1.76...3.....4......5....",
+    "......52..8.4......3...9...5.1...6..2..7........3.....6...1..........7.4.......3.",
+    ".524.........7.1..............8.2...3.....6...9.5.....1.6.3...........897........",
+    ".923.........8.1...........1.7.4...........658.........6.5.2...4.....7.....9.....",
+    "..............3.85..1.2.......5.7.....4...1...9.......5......73..2.1........4...9",
+]
+SETS = {"easy": EASY, "hard": HARD, "17": SEVENTEEN}
+
+
+def percentile(values, p):
+    """Returns the p-th percentile (nearest rank) of a non-empty list."""
+    values = sorted(values)
+    return values[max(0, ceil(p / 100 * len(values)) - 1)]
+
+
+def propagation_name(propagation):
+    """Converts a sequence of propagation steps to a comma-separated string."""
+    names = {f: name for name, f in PROPAGATORS.items()}
+    return ",".join(names[f] for f in propagation)
+
+
+def bench(puzzles, engine="recursive", propagation=DEFAULT_PROPAGATION,
+          limit=None, repeat=1):
+    """
+    Solves each of the one-line puzzles repeat times with the given engine,
+    enumerating up to limit solutions (all if None). Returns a dict with the
+    throughput, the latency percentiles and the recursion statistics summed on
+    all the solves.
+    """
+    grids = [line_to_grid(p) for p in puzzles]
+    next(solve(grids[0], 1, engine, propagation), None)  # Warm-up
+    latencies = []
+    sols = calls = 0
+    level_calls, level_sols = {}, {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for grid in grids:
+            stats = SolveStats()
+            t = time.perf_counter()
+            sols += sum(1 for _ in solve(grid, limit, engine, propagation,
+                                         stats))
+            latencies.append(time.perf_counter() - t)
+            calls += stats.recursive_calls
+            for l, c, s in stats.histogram():
+                level_calls[l] = level_calls.get(l, 0) + c
+                level_sols[l] = level_sols.get(l, 0) + s
+    seconds = time.perf_counter() - start
+    return {
+        "engine": engine,
+        "propagation": propagation_name(propagation),
+        "puzzles": len(latencies),
+        "solutions": sols,
+        "seconds": seconds,
+        "puzzles_per_sec": len(latencies) / seconds,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "recursive_calls": calls,
+        "level_calls": level_calls,
+        "level_sols": level_sols,
+    }
+
+
+def result_key(res):
+    """Returns what identifies a result when comparing two runs."""
+    return res["set"], res["engine"], res["propagation"]
+
+
+def print_results(results, old=None):
+    """Prints results as a table, with the changes from the old ones if any."""
+    old = {result_key(r): r for r in old or []}
+    print("{:<5} {:<9} {:<13} {:>9} {:>9} {:>9} {:>11}".format(
+        "Set", "Engine", "Propagation", "Puzzles/s", "p50 ms", "p99 ms",
+        "Rec. calls"))
+    for res in results:
+        print("{:<5} {:<9} {:<13} {:>9.1f} {:>9.2f} {:>9.2f} {:>11d}".format(
+            res["set"], res["engine"], res["propagation"] or "-",
+            res["puzzles_per_sec"], res["p50_ms"], res["p99_ms"],
+            res["recursive_calls"]))
+        prev = old.get(result_key(res))
+        if prev is not None:
+            print("{:<29} {:>+8.1%} {:>+8.1%} {:>+8.1%} {:>+10.1%}".format(
+                "  vs. previous run",
+                res["puzzles_per_sec"] / prev["puzzles_per_sec"] - 1,
+                res["p50_ms"] / prev["p50_ms"] - 1,
+                res["p99_ms"] / prev["p99_ms"] - 1,
+                res["recursive_calls"] / max(1, prev["recursive_calls"]) - 1))
+
+
+def print_histogram(res):
+    """Prints the per-level recursion histogram of a result."""
+    print()
+    print("{} / {} / {}".format(res["set"], res["engine"],
+                                res["propagation"] or "-"))
+    print("Level   Calls   Solutions")
+    for l in sorted(res["level_calls"], key=int):
+        print("{:^5d} {:^9d} {:^9d}".format(int(l), res["level_calls"][l],
+                                            res["level_sols"].get(l, 0)))
+
+
+def main(argv=None):
+    """Command line interface (see --help)."""
+    parser = argparse.ArgumentParser(description="Benchmark the sudoku solver "
+                                     "engines on built-in puzzle sets.")
+    parser.add_argument("-e", "--engine", action="append",
+                        choices=list(ENGINES),
+                        help="engine to benchmark, can be repeated (default: "
+                        "all)")
+    parser.add_argument("-s", "--set", action="append", choices=list(SETS),
+                        help="puzzle set to run, can be repeated (default: "
+                        "all)")
+    parser.add_argument("-p", "--propagate", type=propagation_arg,
+                        default=DEFAULT_PROPAGATION, metavar="STEPS",
+                        help="comma-separated propagation steps, among {} "
+                        "(default: naked,hidden)".format(",".join(PROPAGATORS)))
+    parser.add_argument("-l", "--limit", type=int, default=None,
+                        help="stop each solve after this many solutions "
+                        "(default: enumerate all of them)")
+    parser.add_argument("-r", "--repeat", type=int, default=1,
+                        help="times each set is run (default: %(default)s)")
+    parser.add_argument("-o", "--output", metavar="FILE",
+                        help="write the results as JSON to FILE")
+    parser.add_argument("-c", "--compare", metavar="FILE",
+                        help="compare with the JSON results of a previous run")
+    parser.add_argument("--histogram", action="store_true",
+                        help="also print the per-level recursion histograms")
+    args = parser.parse_args(argv)
+
+    old = None
+    if args.compare is not None:
+        with open(args.compare) as ifs:
+            old = json.load(ifs)["results"]
+    results = []
+    for name in args.set or SETS:
+        for engine in args.engine or ENGINES:
+            res = bench(SETS[name], engine, args.propagate, args.limit,
+                        args.repeat)
+            res["set"] = name
+            results.append(res)
+            print("Done {} with {}.".format(name, engine), file=sys.stderr)
+    print_results(results, old)
+    if args.histogram:
+        for res in results:
+            print_histogram(res)
+    if args.output is not None:
+        with open(args.output, "w") as ofs:
+            json.dump({"python": platform.python_version(),
+                       "machine": platform.machine(),
+                       "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "limit": args.limit, "repeat": args.repeat,
+                       "results": results}, ofs, indent=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# Cache of sudoku solutions indexed by the canonical form of the puzzles, so
+# that puzzles differing only by a symmetry of the grid (relabeled numbers, rows
+# or columns swapped within their band or stack, bands or stacks swapped, grid
+# transposed) are solved only once.
+# A transform is (transposed, rows, cols, relabel): the cell (i, j) of the
+# transformed grid is relabel[g[rows[i]][cols[j]]], g being the grid (or its
+# transpose if transposed) and relabel a permutation of the numbers with
+# relabel[0] = 0.
+import argparse
+import json
+import os
+import sys
+from collections import OrderedDict
+from itertools import islice, permutations, product
+
+from sudokusolver import (DEFAULT_PROPAGATION, ENGINES, PROPAGATORS, get_layout,
+                          grid_to_line, line_to_grid, propagation_arg, solve)
+
+# Most transforms compared to find the canonical form of a grid: grids with
+# more symmetries than this get a form that is not always the same for all the
+# equivalent grids, which only costs cache misses
+CANONICAL_LIMIT = 512
+
+
+def transpose(grid):
+    """Returns the transpose of grid."""
+    return [list(col) for col in zip(*grid)]
+
+
+def apply_transform(grid, transform):
+    """Returns grid transformed by transform."""
+    transposed, rows, cols, relabel = transform
+    if transposed:
+        grid = transpose(grid)
+    return [[relabel[grid[i][j]] for j in cols] for i in rows]
+
+
+def invert_transform(grid, transform):
+    """Returns the grid that transform turns into grid."""
+    transposed, rows, cols, relabel = transform
+    size = len(grid)
+    inverse = [0] * (size + 1)
+    for x, y in enumerate(relabel):
+        inverse[y] = x
+    orig = [[0] * size for _ in range(size)]
+    for i, row in zip(rows, grid):
+        orig_row = orig[i]
+        for j, x in zip(cols, row):
+            orig_row[j] = inverse[x]
+    return transpose(orig) if transposed else orig
+
+
+def line_keys(grid):
+    """
+    Returns the keys of the rows of grid: for each row, its number of clues and
+    the sorted number of clues of the columns and numbers found in it. The keys
+    do not change under the symmetries that keep the rows as rows.
+    """
+    size = len(grid)
+    freq = [0] * (size + 1)
+    col_count = [0] * size
+    for row in grid:
+        for j, x in enumerate(row):
+            if x:
+                freq[x] += 1
+                col_count[j] += 1
+    return [(sum(1 for x in row if x),
+             tuple(sorted(freq[x] for x in row if x)),
+             tuple(sorted(col_count[j] for j, x in enumerate(row) if x)))
+            for row in grid]
+
+
+def tie_orders(items, key):
+    """
+    Yields the orderings of items (sorted by key) obtained by permuting the runs
+    of items with the same key.
+    """
+    runs = []
+    for item in items:
+        if runs and key(runs[-1][0]) == key(item):
+            runs[-1].append(item)
+        else:
+            runs.append([item])
+    for parts in product(*(permutations(run) for run in runs)):
+        yield [item for part in parts for item in part]
+
+
+def line_orders(keys, box):
+    """
+    Yields the orderings of the lines (rows or columns) with the given keys
+    that keep bands (or stacks) together and sort lines and bands by key.
+    """
+    bands = [range(b * box, b * box + box) for b in range(box)]
+    band_keys = [tuple(sorted(keys[l] for l in band)) for band in bands]
+    inner = [list(tie_orders(sorted(band, key=keys.__getitem__),
+                             keys.__getitem__)) for band in bands]
+    for band_order in tie_orders(sorted(range(box),
+                                        key=band_keys.__getitem__),
+                                 band_keys.__getitem__):
+        for parts in product(*(inner[b] for b in band_order)):
+            yield [l for part in parts for l in part]
+
+
+def relabeled(grid, rows, cols):
+    """
+    Returns the cells of grid in the order given by rows and cols, as a tuple,
+    with the numbers relabeled by order of first appearance, and the relabel
+    list (the numbers not found are relabeled last, in increasing order).
+    """
+    size = len(grid)
+    relabel = [0] * (size + 1)
+    n = 0
+    cells = []
+    for i in rows:
+        row = grid[i]
+        for j in cols:
+            x = row[j]
+            if x and not relabel[x]:
+                n += 1
+                relabel[x] = n
+            cells.append(relabel[x])
+    for x in range(1, size + 1):
+        if not relabel[x]:
+            n += 1
+            relabel[x] = n
+    return tuple(cells), relabel
+
+
+def canonical_form(grid):
+    """
+    Returns (canon, transform): canon is the smallest grid (comparing the cells
+    row by row) that a transform keeping the sorted line keys (see line_keys)
+    turns grid into, and transform is that transform. Equivalent grids have the
+    same canonical form, unless they have too many symmetries (see
+    CANONICAL_LIMIT).
+    """
+    box = get_layout(len(grid)).box
+    candidates = []
+    for transposed in (False, True):
+        g = transpose(grid) if transposed else grid
+        row_keys = line_keys(g)
+        col_keys = line_keys(transpose(g))
+        profile = (sorted(row_keys), sorted(col_keys))
+        candidates.append((profile, transposed, g, row_keys, col_keys))
+    candidates.sort(key=lambda c: c[0])
+    if candidates[0][0] != candidates[1][0]:
+        del candidates[1]  # Only the orientation with the smallest profile
+    best = None
+    tried = 0
+    for _, transposed, g, row_keys, col_keys in candidates:
+        col_orders = list(islice(line_orders(col_keys, box), CANONICAL_LIMIT))
+        for rows in line_orders(row_keys, box):
+            for cols in col_orders:
+                cells, relabel = relabeled(g, rows, cols)
+                if best is None or cells < best[0]:
+                    best = cells, (transposed, rows, cols, relabel)
+                tried += 1
+                if tried >= CANONICAL_LIMIT:
+                    break
+            if tried >= CANONICAL_LIMIT:
+                break
+    cells, transform = best
+    size = len(grid)
+    return ([list(cells[i:i + size]) for i in range(0, len(cells), size)],
+            transform)
+
+
+class SolutionCache:
+    """
+    Bounded LRU cache of canonical puzzle -> solutions, optionally persisted to
+    a JSON file (loaded when the cache is created, written by save). Solutions
+    are stored in the canonical orientation and transformed back to that of the
+    puzzle being solved.
+    """
+
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = self.misses = 0
+        # Canonical one-line puzzle: (canonical one-line solutions, complete),
+        # complete being False if the search was stopped by a limit
+        self.entries = OrderedDict()
+        if path is not None and os.path.exists(path):
+            with open(path) as ifs:
+                for key, sols, complete in json.load(ifs)["entries"]:
+                    self.entries[key] = sols, complete
+            self.trim()
+
+    def trim(self):
+        """Drops the least recently used entries above maxsize."""
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def save(self):
+        """Writes the cache to its file, if any."""
+        if self.path is None:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as ofs:
+            json.dump({"entries": [[key, sols, complete] for key, (sols,
+                                   complete) in self.entries.items()]}, ofs)
+        os.replace(tmp, self.path)
+
+    def solve(self, grid, limit=None, engine="trail",
+              propagation=DEFAULT_PROPAGATION, stats=None):
+        """
+        Returns the list of the solutions of grid (at most limit of them if
+        limit is not None), from the cache if an equivalent puzzle was solved
+        before, otherwise from solve (see there for the other arguments, stats
+        is only updated on misses).
+        """
+        canon, transform = canonical_form(grid)
+        key = grid_to_line(canon)
+        entry = self.entries.get(key)
+        if entry is not None and (entry[1] or limit is not None and
+                                  len(entry[0]) >= limit):
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return [invert_transform(line_to_grid(sol), transform)
+                    for sol in entry[0][:limit]]
+        self.misses += 1
+        sols = list(solve(grid, limit, engine, propagation, stats))
+        complete = limit is None or len(sols) < limit
+        self.entries[key] = ([grid_to_line(apply_transform(sol, transform))
+                              for sol in sols], complete)
+        self.entries.move_to_end(key)
+        self.trim()
+        return sols
+
+
+def main(argv=None):
+    """Command line interface (see --help)."""
+    parser = argparse.ArgumentParser(description="Solve one-line puzzles "
+                                     "through a cache of canonical forms, "
+                                     "printing each puzzle with its first "
+                                     "solution.")
+    parser.add_argument("file", help="file of one-line puzzles, - for the "
+                        "standard input")
+    parser.add_argument("-e", "--engine", choices=list(ENGINES),
+                        default="trail",
+                        help="solving engine (default: %(default)s)")
+    parser.add_argument("-p", "--propagate", type=propagation_arg,
+                        default=DEFAULT_PROPAGATION, metavar="STEPS",
+                        help="comma-separated propagation steps, among {} "
+                        "(default: naked,hidden)".format(",".join(PROPAGATORS)))
+    parser.add_argument("--cache", metavar="FILE",
+                        help="JSON file the cache is loaded from and saved to")
+    parser.add_argument("--maxsize", type=int, default=4096,
+                        help="most puzzles kept in the cache (default: "
+                        "%(default)s)")
+    args = parser.parse_args(argv)
+
+    cache = SolutionCache(args.maxsize, args.cache)
+    ifs = sys.stdin if args.file == "-" else open(args.file)
+    with ifs:
+        for line in ifs:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                grid = line_to_grid(line)
+            except ValueError:
+                print(line, "-")
+                continue
+            sols = cache.solve(grid, 1, args.engine, args.propagate)
+            print(line, grid_to_line(sols[0]) if sols else "-")
+    cache.save()
+    print("{} hits, {} misses.".format(cache.hits, cache.misses),
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
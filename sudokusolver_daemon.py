@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# Long-running solver serving puzzles on a Unix domain socket, one request per
+# line: either a puzzle in the one-line format, answered with the puzzle and its
+# first solution (like --batch), or a JSON object like
+#   {"id": 1, "puzzle": "...", "mode": "solve", "limit": 1, "engine": "trail",
+#    "propagate": "naked,hidden"}
+# (only "puzzle" is required, mode is one of solve, count and unique) answered
+# with a JSON object holding the same id, the solutions (or count, or result)
+# and the recursion statistics of the call. Responses come in request order on
+# each connection. Requests from all the connections are grouped in batches
+# solved by a pool of worker processes started once.
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from sudokusolver import (DEFAULT_PROPAGATION, ENGINES, PROPAGATORS,
+                          UNIQUE_RESULTS, SolveStats, count_solutions,
+                          grid_to_line, line_to_grid, propagation_arg, solve)
+
+# Default engine and propagation of the requests, in the worker processes
+_daemon_config = ("trail", DEFAULT_PROPAGATION)
+# Types of the fields of the JSON requests (true and false are not limits)
+REQUEST_TYPES = {"puzzle": str, "engine": str, "propagate": str,
+                 "mode": str, "limit": (int, type(None))}
+
+
+def daemon_init(engine, propagation):
+    """Initializes a worker process, warming up the engines."""
+    global _daemon_config
+    _daemon_config = engine, propagation
+    grid = [[0] * 9 for _ in range(9)]
+    for name in ENGINES:
+        next(solve(grid, 1, name), None)
+
+
+def daemon_solve(req):
+    """
+    Solves a request (a dict as sent in JSON, without id). Returns the response
+    dict, with an "error" message if the request is invalid.
+    """
+    try:
+        for key, types in REQUEST_TYPES.items():
+            value = req.get(key)
+            if key in req and (not isinstance(value, types) or
+                               isinstance(value, bool)):
+                raise TypeError("Invalid {}: {!r}!".format(key, value))
+        engine, propagation = _daemon_config
+        engine = req.get("engine", engine)
+        if engine not in ENGINES:
+            raise ValueError("Unknown engine {!r}!".format(engine))
+        if "propagate" in req:
+            propagation = propagation_arg(req["propagate"])
+        mode = req.get("mode", "solve")
+        limit = req.get("limit")
+        grid = line_to_grid(req["puzzle"])
+        stats = SolveStats()
+        if mode == "count":
+            res = {"count": count_solutions(grid, limit, engine, propagation,
+                                            stats)}
+        elif mode == "unique":
+            res = {"result": UNIQUE_RESULTS[count_solutions(
+                grid, 2, engine, propagation, stats)]}
+        elif mode == "solve":
+            sols = solve(grid, 1 if limit is None else limit, engine,
+                         propagation, stats)
+            res = {"solutions": [grid_to_line(sol) for sol in sols]}
+        else:
+            raise ValueError("Unknown mode {!r}!".format(mode))
+    except (KeyError, TypeError, ValueError, argparse.ArgumentTypeError) as e:
+        return {"error": str(e)}
+    hist = stats.histogram()
+    res["stats"] = {"recursive_calls": stats.recursive_calls,
+                    "level_calls": [calls for _, calls, _ in hist],
+                    "level_sols": [sols for _, _, sols in hist]}
+    return res
+
+
+def daemon_batch(reqs):
+    """
+    Solves a list of requests, returning the list of the responses. A request
+    making the solver fail gets an error response, the others are solved.
+    """
+    results = []
+    for req in reqs:
+        try:
+            results.append(daemon_solve(req))
+        except Exception as e:
+            results.append({"error": "Solver failure: {}".format(e)})
+    return results
+
+
+def parse_request(line):
+    """
+    Returns (req, rid, is_json) for a request line: req is the dict given to
+    daemon_solve, rid the request id.
+    """
+    if not line.startswith("{"):
+        return {"puzzle": line}, None, False
+    try:
+        req = json.loads(line)
+    except ValueError as e:
+        req = {"error": "Invalid JSON: {}".format(e)}
+    if not isinstance(req, dict):
+        req = {"error": "Not a JSON object!"}
+    return req, req.pop("id", None), True
+
+
+def format_response(res, req, rid, is_json):
+    """Returns the response line to a request."""
+    if is_json:
+        return json.dumps(dict(res, id=rid))
+    sols = res.get("solutions")
+    return "{} {}".format(req["puzzle"], sols[0] if sols else "-")
+
+
+class SolverDaemon:
+    """
+    Socket server and request batcher. Requests wait at most delay seconds for
+    a batch to fill up to batch_size requests; batches go to a pool of
+    workers processes, or are solved in the server process if workers is 0.
+    """
+
+    def __init__(self, path, workers=None, batch_size=64, delay=0.0002,
+                 engine="trail", propagation=DEFAULT_PROPAGATION):
+        self.path = path
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.workers = workers
+        self.batch_size = batch_size
+        self.delay = delay
+        self.config = (engine, propagation)
+        self.queue = None  # (req, future) waiting for a batch
+        self.pool = None
+
+    async def run_batch(self, batch, slots):
+        """Solves a batch and sets the futures of its requests."""
+        try:
+            reqs = [req for req, _ in batch]
+            if self.pool is None:
+                results = daemon_batch(reqs)
+            else:
+                results = await asyncio.get_running_loop().run_in_executor(
+                    self.pool, daemon_batch, reqs)
+        except Exception as e:
+            results = [{"error": "Solver failure: {}".format(e)}] * len(batch)
+        finally:
+            slots.release()
+        for (_, future), res in zip(batch, results):
+            if not future.done():
+                future.set_result(res)
+
+    async def batcher(self):
+        """Groups the queued requests in batches and dispatches them."""
+        loop = asyncio.get_running_loop()
+        # At most two batches per worker in flight, the rest waits in queue
+        slots = asyncio.Semaphore(2 * max(1, self.workers))
+        tasks = set()  # Batches in flight (the loop keeps weak references)
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.delay
+            while len(batch) < self.batch_size:
+                if self.queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(),
+                                                            timeout))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self.queue.get_nowait())
+            await slots.acquire()
+            task = loop.create_task(self.run_batch(batch, slots))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    async def handle(self, reader, writer):
+        """Serves a connection, answering its requests in order."""
+        loop = asyncio.get_running_loop()
+        pending = asyncio.Queue()  # (future, req, rid, is_json), None at EOF
+
+        async def respond():
+            while True:
+                item = await pending.get()
+                if item is None:
+                    break
+                future, req, rid, is_json = item
+                line = format_response(await future, req, rid, is_json)
+                writer.write(line.encode() + b"\n")
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    return  # Client gone
+
+        responder = loop.create_task(respond())
+        try:
+            async for line in reader:
+                line = line.decode(errors="replace").strip()
+                if not line or line.startswith("#"):
+                    continue
+                req, rid, is_json = parse_request(line)
+                future = loop.create_future()
+                if "error" in req:
+                    future.set_result(req)
+                else:
+                    await self.queue.put((req, future))
+                pending.put_nowait((future, req, rid, is_json))
+            pending.put_nowait(None)
+            await responder
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            responder.cancel()  # Client gone or line too long
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """Runs the server until cancelled."""
+        self.queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        if self.workers > 0:
+            self.pool = ProcessPoolExecutor(self.workers, None, daemon_init,
+                                            self.config)
+            # Start all the workers now instead of at the first requests
+            await asyncio.gather(*(
+                loop.run_in_executor(self.pool, daemon_batch, [])
+                for _ in range(self.workers)))
+        else:
+            daemon_init(*self.config)
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # Stale socket of a previous run
+        server = await asyncio.start_unix_server(self.handle, self.path)
+        batcher = loop.create_task(self.batcher())
+        loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+
+def daemon_requests(path, lines):
+    """
+    Sends the request lines to the daemon listening on path, yielding the
+    response lines in the same order.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall("".join(line.strip() + "\n" for line in lines).encode())
+        sock.shutdown(socket.SHUT_WR)
+        with sock.makefile() as ifs:
+            for line in ifs:
+                yield line.rstrip("\n")
+
+
+def main(argv=None):
+    """Command line interface (see --help)."""
+    parser = argparse.ArgumentParser(description="Serve sudoku solves on a "
+                                     "Unix domain socket, or send requests to "
+                                     "it.")
+    parser.add_argument("socket", help="path of the socket")
+    parser.add_argument("--client", action="store_true",
+                        help="send the request lines read from the standard "
+                        "input to a running daemon and print the responses")
+    parser.add_argument("-e", "--engine", choices=list(ENGINES),
+                        default="trail", help="default engine of the requests "
+                        "(default: %(default)s)")
+    parser.add_argument("-p", "--propagate", type=propagation_arg,
+                        default=DEFAULT_PROPAGATION, metavar="STEPS",
+                        help="default propagation steps of the requests, "
+                        "among {} (default: naked,hidden)"
+                        .format(",".join(PROPAGATORS)))
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU, 0 "
+                        "solves in the server process)")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="most requests solved by a worker at a time "
+                        "(default: %(default)s)")
+    parser.add_argument("--delay", type=float, default=0.2,
+                        help="milliseconds a request waits for a batch to "
+                        "fill up (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.client:
+        for line in daemon_requests(args.socket, sys.stdin):
+            print(line)
+        return
+    daemon = SolverDaemon(args.socket, args.workers, args.batch_size,
+                          args.delay / 1000, args.engine, args.propagate)
+    print("Serving on {} with {} workers.".format(args.socket, daemon.workers),
+          file=sys.stderr)
+    try:
+        asyncio.run(daemon.serve())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass  # Stopped by SIGINT or SIGTERM
+
+
+if __name__ == "__main__":
+    main()
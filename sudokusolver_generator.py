@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# Generator of uniquely solvable sudoku puzzles of a given difficulty: a random
+# solved grid is built, then its clues are removed one by one (in random order)
+# as long as the solution stays unique.
+import argparse
+import multiprocessing
+import random
+
+from sudokusolver import (DEFAULT_PROPAGATION, SearchState, choose_cell,
+                          fill_unique, get_layout, get_masks, grid_to_line,
+                          mask_values, propagate, set_cell, trail_split, undo)
+
+# Difficulty levels, from the easiest, as returned by grade
+DIFFICULTIES = ("easy", "medium", "hard", "expert")
+# Deepest recursion level of the search for a "hard" puzzle
+HARD_DEPTH = 2
+
+
+def random_fill(grid, masks, trail, rng):
+    """
+    Fills the empty cells of grid with a random solution, trying the possible
+    values in random order. Returns False, leaving grid as it was, if there is
+    no solution.
+    """
+    mark = len(trail)
+    if propagate(grid, masks, trail, (fill_unique,)) != -1:
+        cell = choose_cell(grid, masks)
+        if cell is None:
+            return True  # Grid is full
+        i, j, possib = cell
+        values = list(mask_values(possib))
+        rng.shuffle(values)
+        for x in values:
+            set_cell(grid, masks, i, j, x)
+            trail.append((i, j))
+            if random_fill(grid, masks, trail, rng):
+                return True
+            undo(grid, masks, trail, len(trail) - 1)
+    undo(grid, masks, trail, mark)
+    return False
+
+
+def random_grid(size=9, rng=random):
+    """Returns a random solved grid of the given size."""
+    get_layout(size)  # Checks the size
+    grid = [[0] * size for _ in range(size)]
+    random_fill(grid, get_masks(grid), [], rng)
+    return grid
+
+
+def shallow_unique(state, depth):
+    """
+    Returns True if the grid of the SearchState state has a single solution
+    and its search never recurses deeper than depth levels. The search stops
+    at the first branch reaching deeper, so its cost is bounded by depth.
+    """
+    search = trail_split(state.grid, state.masks, state.trail, depth + 1,
+                         state.propagation)
+    n = 0
+    try:
+        for _, solved in search:
+            n += 1
+            if not solved or n > 1:
+                return False
+    finally:
+        search.close()  # Rolls back the search
+    return n == 1
+
+
+def grade(grid):
+    """
+    Returns the difficulty of a uniquely solvable grid, from the statistics of
+    its solution: "easy" if naked singles solve it, "medium" if hidden singles
+    are also needed, "hard" if a search is needed but never deeper than
+    HARD_DEPTH levels and "expert" otherwise (see shallow_unique, expert grids
+    are not searched in full).
+    """
+    state = SearchState(grid)
+    if state.solved_by((fill_unique,)):
+        return "easy"
+    if state.solved_by(DEFAULT_PROPAGATION):
+        return "medium"
+    return "hard" if shallow_unique(state, HARD_DEPTH) else "expert"
+
+
+def remove_clues(solution, rng=random, solvable_by=None, max_depth=None):
+    """
+    Returns a puzzle with the given solution, from which no clue can be removed
+    without making the solution not unique (or, if solvable_by is given, not
+    reachable by that propagation alone, or, if max_depth is given, not
+    reachable without searching deeper than max_depth levels). The clues are
+    removed in random order on a single search state. A grid that propagation
+    alone solves has a unique solution, so with solvable_by no search is
+    needed; otherwise the grid stays unique after removing the number x from
+    a cell iff no solution has another number there, which is checked with a
+    single search (bounded by max_depth, if given, see shallow_unique).
+    """
+    state = SearchState(solution)
+    size = len(solution)
+    cells = [(i, j) for i in range(size) for j in range(size)]
+    rng.shuffle(cells)
+    for i, j in cells:
+        x = state.grid[i][j]
+        state.clear(i, j)
+        if solvable_by is not None:
+            needed = not state.solved_by(solvable_by)
+        elif max_depth is not None:
+            needed = not shallow_unique(state, max_depth)
+        else:
+            needed = state.has_other_solution(i, j, x)
+        if needed:
+            state.set(i, j, x)  # Needed clue, put it back
+    return state.grid
+
+
+def generate(difficulty="medium", size=9, rng=random, max_tries=100):
+    """
+    Returns (puzzle, solution) with a uniquely solvable puzzle of the given
+    difficulty (see grade), trying up to max_tries random solved grids.
+    """
+    level = DIFFICULTIES.index(difficulty)
+    # Easy and medium puzzles must stay solvable with singles alone, hard ones
+    # with a shallow search
+    solvable_by = ((fill_unique,), DEFAULT_PROPAGATION, None, None)[level]
+    max_depth = HARD_DEPTH if difficulty == "hard" else None
+    for _ in range(max_tries):
+        solution = random_grid(size, rng)
+        puzzle = remove_clues(solution, rng, solvable_by, max_depth)
+        if grade(puzzle) == difficulty:
+            return puzzle, solution
+    raise RuntimeError("No {} puzzle found in {} tries".format(difficulty,
+                                                               max_tries))
+
+
+# Batch generation
+_generate_config = None  # (difficulty, size, seed) in the worker processes
+
+
+def generate_init(difficulty, size, seed):
+    """Initializer of the batch worker processes."""
+    global _generate_config
+    _generate_config = (difficulty, size, seed)
+
+
+def generate_line(k):
+    """Generates the k-th puzzle of a batch, as one-line puzzle and solution."""
+    difficulty, size, seed = _generate_config
+    rng = random.Random(None if seed is None else "{}-{}".format(seed, k))
+    puzzle, solution = generate(difficulty, size, rng)
+    return grid_to_line(puzzle), grid_to_line(solution)
+
+
+def main(argv=None):
+    """Command line interface (see --help)."""
+    parser = argparse.ArgumentParser(description="Generate uniquely solvable "
+                                     "sudoku puzzles, one per line.")
+    parser.add_argument("-n", "--number", type=int, default=1,
+                        help="number of puzzles (default: %(default)s)")
+    parser.add_argument("-d", "--difficulty", choices=DIFFICULTIES,
+                        default="medium",
+                        help="difficulty of the puzzles (default: "
+                        "%(default)s)")
+    parser.add_argument("-s", "--size", type=int, default=9,
+                        help="grid size, a square number (default: "
+                        "%(default)s)")
+    parser.add_argument("--seed", help="seed of the random generator, for "
+                        "reproducible output")
+    parser.add_argument("--solutions", action="store_true",
+                        help="print the solution after each puzzle")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes (default: "
+                        "%(default)s, 0 means one per CPU)")
+    args = parser.parse_args(argv)
+    try:
+        get_layout(args.size)
+    except ValueError:
+        parser.error("argument -s/--size: not a square")
+
+    config = (args.difficulty, args.size, args.seed)
+    if args.jobs == 1:
+        generate_init(*config)
+        lines = map(generate_line, range(args.number))
+        pool = None
+    else:
+        pool = multiprocessing.Pool(args.jobs or None, generate_init, config)
+        lines = pool.imap(generate_line, range(args.number))
+    try:
+        for puzzle, solution in lines:
+            if args.solutions:
+                print(puzzle, solution)
+            else:
+                print(puzzle)
+    except RuntimeError as e:
+        parser.exit(1, "{}.\n".format(e))  # No puzzle of that difficulty
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# Batch solver propagating naked and hidden singles on many grids at once with
+# NumPy: the grids of a batch are the rows of an (N, size * size) array and the
+# candidates of all their cells are computed with a few array operations per
+# step. Only the grids that propagation does not solve are searched one by one.
+# NumPy is optional: without it every grid is solved one by one.
+import argparse
+import sys
+from itertools import islice
+from math import isqrt
+
+from sudokusolver import (COMPACT_VALUES, DEFAULT_PROPAGATION, ENGINES,
+                          PROPAGATORS, get_layout, grid_to_line, line_to_grid,
+                          map_puzzles, propagation_arg, solve)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def box_cells(a, box):
+    """
+    Returns a copy of the (M, size, size) array a with the cells of each grid
+    ordered box by box instead of row by row.
+    """
+    m, size, _ = a.shape
+    return a.reshape(m, box, box, box, box).transpose(0, 1, 3, 2, 4).reshape(
+        m, size, size)
+
+
+def unit_counts(a):
+    """
+    Returns (once, twice) for the (M, units, cells) array of bitmasks a: the
+    bitmasks of the numbers found at least once and at least twice in the cells
+    of each unit.
+    """
+    once = np.zeros_like(a[:, :, 0])
+    twice = np.zeros_like(once)
+    for j in range(a.shape[2]):
+        twice |= once & a[:, :, j]
+        once |= a[:, :, j]
+    return once, twice
+
+
+def cell_masks(rows, cols, boxes, box):
+    """Returns the OR of the masks of the units of each cell of M grids."""
+    m, size = rows.shape
+    masks = (rows[:, :, None] | cols[:, None, :]).reshape(m, box, box, box,
+                                                          box)
+    masks |= boxes.reshape(m, box, 1, box, 1)
+    return masks.reshape(m, size, size)
+
+
+def vector_propagate(cells, size):
+    """
+    Fills, in place, the cells of the grids in cells (an (N, size * size) int
+    array, 0 for empty cells) deduced by naked and hidden singles, until no grid
+    changes. Returns a bool array telling which grids are still consistent.
+    The numbers of each unit are kept as bitmasks, the ones possible once or
+    more and twice or more in each unit are found with a pass on its cells.
+    """
+    layout = get_layout(size)
+    box, all_mask = layout.box, layout.all_mask
+    dtype = np.int16 if size < 15 else np.int32 if size < 31 else np.int64
+    alive = np.ones(len(cells), dtype=bool)
+    active = np.arange(len(cells))  # Grids that changed in the last step
+    while len(active):
+        sub = cells[active].reshape(-1, size, size)
+        empty = sub == 0
+        bits = np.left_shift(1, sub.astype(dtype)) & all_mask
+        # A unit with a number more than once is an error
+        units = [unit_counts(a) for a in (bits, bits.transpose(0, 2, 1),
+                                          box_cells(bits, box))]
+        dead = np.zeros(len(sub), dtype=bool)
+        for _, twice in units:
+            dead |= (twice != 0).any(axis=1)
+        placed = [once for once, _ in units]
+        cand = np.where(empty, all_mask & ~cell_masks(*placed, box), 0)
+        cand = cand.astype(dtype)
+        dead |= (empty & (cand == 0)).any(axis=(1, 2))
+        # Hidden singles: numbers possible in one cell of a unit (a number
+        # possible nowhere in a unit that misses it is an error)
+        units = [unit_counts(a) for a in (cand, cand.transpose(0, 2, 1),
+                                          box_cells(cand, box))]
+        for (once, _), p in zip(units, placed):
+            dead |= (once | p != all_mask).any(axis=1)
+        hidden = cand & cell_masks(*(once & ~twice for once, twice in units),
+                                   box)
+        # Naked singles: cells with one possible number (a cell that is the
+        # only place of two numbers is an error)
+        single = np.where(hidden != 0, hidden, cand)
+        dead |= (hidden & (hidden - 1) != 0).any(axis=(1, 2))
+        single[single & (single - 1) != 0] = 0
+        new = np.log2(np.where(single != 0, single, 1)).astype(cells.dtype)
+        new[dead] = 0
+        cells[active] = np.where(new != 0, new, sub).reshape(len(sub), -1)
+        alive[active[dead]] = False
+        active = active[(new != 0).any(axis=(1, 2))]
+    return alive
+
+
+def vector_solve(grids, engine="trail", propagation=DEFAULT_PROPAGATION):
+    """
+    Returns the first solution of each of the grids (all of the same size and
+    either all lists of lists or all compact grids, see grid_copy), None for
+    those without solutions or invalid. Singles are propagated on all the grids
+    at once and the grids still unsolved are then solved one by one, starting
+    from the propagated grid, by the given engine with the given propagation
+    steps.
+    """
+    if np is None or not grids:
+        results = []
+        for grid in grids:
+            try:
+                results.append(next(solve(grid, 1, engine, propagation), None))
+            except ValueError:
+                results.append(None)  # Invalid compact grid
+        return results
+    if isinstance(grids[0], list):
+        size = len(grids[0])
+        cells = np.array([[x for row in grid for x in row] for grid in grids],
+                         dtype=np.int8)
+        valid = np.ones(len(grids), dtype=bool)
+    else:
+        # Compact grids are decoded all at once, without per-cell objects
+        size = isqrt(len(grids[0]))
+        cells = np.frombuffer(b"".join(grids), dtype=np.uint8)
+        cells = np.frombuffer(COMPACT_VALUES, dtype=np.uint8)[cells]
+        cells = cells.reshape(len(grids), -1)
+        valid = (cells <= size).all(axis=1)
+        cells = np.where(valid[:, None], cells, 0).astype(np.int8)
+    alive = vector_propagate(cells, size) & valid
+    results = []
+    for flat, ok in zip(cells.tolist(), alive.tolist()):
+        if not ok:
+            results.append(None)
+            continue
+        grid = [flat[i:i + size] for i in range(0, len(flat), size)]
+        if 0 in flat:
+            grid = next(solve(grid, 1, engine, propagation), None)
+        results.append(grid)
+    return results
+
+
+def vector_batch(lines, engine="trail", propagation=DEFAULT_PROPAGATION,
+                 chunksize=4096):
+    """
+    Yields (puzzle, solution) for each one-line puzzle of the iterable lines,
+    like batch_solve, solving chunks of chunksize puzzles with vector_solve.
+    lines may also be compact grids (e.g. from map_puzzles), which are not
+    decoded one by one. solution is in the one-line format, None for invalid or
+    unsolvable puzzles.
+    """
+    lines = (line.strip() if isinstance(line, str) else line
+             for line in lines)
+    lines = (line for line in lines
+             if len(line) and line[0] not in ("#", ord("#")))
+    for chunk in iter(lambda: list(islice(lines, chunksize)), []):
+        results = [None] * len(chunk)
+        by_size = {}  # (Size, compact): list of (index in chunk, grid)
+        for k, line in enumerate(chunk):
+            if isinstance(line, str):
+                try:
+                    grid = line_to_grid(line)
+                except ValueError:
+                    continue
+                by_size.setdefault((len(grid), False), []).append((k, grid))
+                continue
+            size = isqrt(len(line))
+            try:
+                if size * size != len(line):
+                    raise ValueError("Not a square grid!")
+                get_layout(size)
+            except ValueError:
+                continue
+            by_size.setdefault((size, True), []).append((k, line))
+        for batch in by_size.values():
+            sols = vector_solve([grid for _, grid in batch], engine,
+                                propagation)
+            for (k, _), sol in zip(batch, sols):
+                results[k] = None if sol is None else grid_to_line(sol)
+        yield from zip(chunk, results)
+
+
+def main(argv=None):
+    """Command line interface (see --help)."""
+    parser = argparse.ArgumentParser(description="Solve a file of one-line "
+                                     "puzzles, propagating singles on whole "
+                                     "batches of grids with NumPy.")
+    parser.add_argument("file", help="file of one-line puzzles, - for the "
+                        "standard input")
+    parser.add_argument("-e", "--engine", choices=list(ENGINES),
+                        default="trail", help="engine for the grids not "
+                        "solved by propagation (default: %(default)s)")
+    parser.add_argument("-p", "--propagate", type=propagation_arg,
+                        default=DEFAULT_PROPAGATION, metavar="STEPS",
+                        help="comma-separated propagation steps of the "
+                        "engine, among {} (default: naked,hidden)"
+                        .format(",".join(PROPAGATORS)))
+    parser.add_argument("--chunksize", type=int, default=4096,
+                        help="puzzles propagated at once (default: "
+                        "%(default)s)")
+    args = parser.parse_args(argv)
+    if np is None:
+        print("NumPy not found, solving the grids one by one.",
+              file=sys.stderr)
+
+    if args.file == "-":
+        lines = sys.stdin
+    else:
+        lines = map_puzzles(args.file)  # Compact grids, no decoding
+    for puzzle, sol in vector_batch(lines, args.engine, args.propagate,
+                                    args.chunksize):
+        if not isinstance(puzzle, str):
+            puzzle = bytes(puzzle).decode("ascii", "replace")
+        print(puzzle, sol or "-")
+
+
+if __name__ == "__main__":
+    main()
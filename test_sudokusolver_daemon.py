@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# Regression checks of the solver daemon requests, run with pytest or as a
+# script.
+import asyncio
+import json
+
+from sudokusolver_daemon import (SolverDaemon, daemon_batch, format_response,
+                                 parse_request)
+
+PUZZLE = ("530070000600195000098000060800060003400803001700020006060000280"
+          "000419005000080079")
+
+
+def run_lines(lines):
+    """Returns the response lines to request lines solved as one batch."""
+    async def run():
+        daemon = SolverDaemon("unused", workers=0)
+        loop = asyncio.get_running_loop()
+        parsed = [parse_request(line) for line in lines]
+        batch = [(req, loop.create_future()) for req, _, _ in parsed]
+        await daemon.run_batch(batch, asyncio.Semaphore(1))
+        return [format_response(future.result(), req, rid, is_json)
+                for (req, future), (_, rid, is_json) in zip(batch, parsed)]
+    return asyncio.run(run())
+
+
+def test_mixed_batch():
+    """Invalid requests get an error without failing the rest of the batch."""
+    invalid = [{"puzzle": 5}, {"puzzle": PUZZLE, "propagate": 5},
+               {"puzzle": PUZZLE, "limit": "1"}, {"puzzle": PUZZLE,
+                                                  "limit": True},
+               {"puzzle": PUZZLE, "engine": ["trail"]},
+               {"puzzle": PUZZLE, "mode": 1}, {"puzzle": PUZZLE[1:]}]
+    lines = [json.dumps({"id": 0, "puzzle": PUZZLE})]
+    lines += [json.dumps(dict(req, id=k)) for k, req in enumerate(invalid, 1)]
+    lines += [PUZZLE]
+    responses = run_lines(lines)
+    first = json.loads(responses[0])
+    assert first["id"] == 0 and len(first["solutions"]) == 1
+    for k, line in enumerate(responses[1:-1], 1):
+        res = json.loads(line)
+        assert res["id"] == k and "error" in res, line
+        assert not res["error"].startswith("Solver failure"), line
+    assert responses[-1] == "{} {}".format(PUZZLE, first["solutions"][0])
+
+
+def test_solver_failure():
+    """A request failing in the solver only fails itself."""
+    responses = daemon_batch([{"puzzle": PUZZLE}, None, {"puzzle": PUZZLE,
+                                                         "mode": "count"}])
+    assert len(responses[0]["solutions"]) == 1
+    assert responses[1]["error"].startswith("Solver failure")
+    assert responses[2]["count"] == 1
+
+
+if __name__ == "__main__":
+    test_mixed_batch()
+    test_solver_failure()
+    print("OK")